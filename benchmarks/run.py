@@ -0,0 +1,600 @@
+"""
+Benchmark suite for clilib's hot paths. Results are written as JSON, so runs on different versions can be compared.
+
+Usage:
+    python benchmarks/run.py [-o results.json] [-k name] [--quick] [--compare previous.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import clilib
+from clilib.builders.app import CLIApp, EasyCLI, EasyDoc, HTMLObject
+from clilib.config.config_loader import LIBYAML_AVAILABLE, INIConfigurationFile, JSONConfigurationFile, LazyJSONConfigurationFile, YAMLConfigurationFile
+from clilib.events import EventManager
+from clilib.util.arg_tools import arg_tools
+from clilib.util.dict import SearchableDict, compile_path
+from clilib.util.util import SchemaValidator
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def measure(func, quick: bool, min_time: float = 0.2):
+    """
+    Time a callable, calibrating the number of calls per sample like timeit does.
+    :return: dict with the best and median time per call in microseconds, and the number of calls per sample
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    if not quick:
+        number = max(1, int(number * min_time / 0.2))
+    samples = sorted(t / number for t in timer.repeat(repeat=3 if quick else 7, number=number))
+    return {"best_us": samples[0] * 1e6, "median_us": samples[len(samples) // 2] * 1e6, "calls": number}
+
+
+def peak_memory(func):
+    """
+    Call a callable once while tracing memory allocations.
+    :return: Peak traced memory in bytes
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+TREE_METHOD = '''
+    def command%(index)d(self, target: str, count: int = 1, verbose: bool = False, label: str = "x"):
+        """
+        Synthetic command %(index)d
+        :param target: Target of command
+        :param count: Number of repetitions
+        :param verbose: Verbose output
+        :param label: Label to apply
+        """
+        return target
+'''
+
+TREE_CLASS = '''
+class %(name)s:
+    """
+    Synthetic command group %(name)s
+    """
+    def __init__(self, debug: bool = False, config: str = "default"):
+        """
+        :param debug: Enable debugging
+        :param config: Configuration to use
+        """
+        self.debug = debug
+%(methods)s
+%(children)s
+'''
+
+
+def synthetic_tree(width: int, depth: int, branches: int = 2):
+    """
+    Generate a documented class with the given number of commands per level and nested command groups, the way an
+    application would define them in source.
+    """
+    counter = [0]
+    source = []
+
+    def make(level):
+        counter[0] += 1
+        name = "Group%d" % counter[0]
+        children = []
+        if level < depth:
+            for _ in range(branches):
+                children.append(make(level + 1))
+        methods = "".join(TREE_METHOD % {"index": i} for i in range(width))
+        links = "".join("    %s = %s\n" % (child.lower(), child) for child in children)
+        source.append(TREE_CLASS % {"name": name, "methods": methods, "children": links})
+        return name
+
+    root = make(1)
+    namespace = {"__name__": "clilib_bench_tree"}
+    exec("\n".join(source), namespace)
+    return namespace[root]
+
+
+@benchmark
+def easycli_construction(quick: bool):
+    results = {}
+    for width, depth in ((5, 1), (50, 1), (5, 3), (20, 3)):
+        tree = synthetic_tree(width, depth)
+        results["width%d_depth%d" % (width, depth)] = measure(lambda: EasyCLI(tree, execute=False), quick)
+    return results
+
+
+@benchmark
+def build_full_cli(quick: bool):
+    tree = synthetic_tree(20, 3)
+    spec = EasyCLI(tree, execute=False).spec.freeze()
+    argv = ["-d", "group2", "group3", "command7", "target", "--count", "3"]
+    return {
+        "full": measure(lambda: arg_tools.build_full_cli(spec, argv=argv), quick),
+        "lazy": measure(lambda: arg_tools.build_full_cli(spec, lazy=True, argv=argv), quick),
+    }
+
+
+def manpage_spec(commands: int, groups: int = 50):
+    """
+    Build a specification with the given number of leaf commands spread evenly over subcommand groups.
+    """
+    per_group = max(1, commands // groups)
+    spec = {"name": "bench", "desc": "Synthetic benchmark application", "flags": [], "aliases": [], "positionals": [], "subcommands": []}
+    for g in range(groups):
+        group = {"name": "group%d" % g, "desc": "Command group %d" % g, "flags": [], "aliases": [], "positionals": [], "subcommands": []}
+        for c in range(per_group):
+            group["subcommands"].append({
+                "name": "command%d" % c,
+                "desc": "Synthetic command %d in group %d" % (c, g),
+                "flags": [
+                    {"names": ["-v", "--verbose"], "help": "Verbose output", "default": False, "required": False, "action": "store_true"},
+                    {"names": ["-c", "--count"], "help": "Number of repetitions", "type": int, "default": 1, "required": False},
+                ],
+                "aliases": [],
+                "positionals": [{"name": "target", "help": "Target to operate on", "type": str, "metavar": "TARGET"}],
+                "subcommands": []
+            })
+        spec["subcommands"].append(group)
+    return spec
+
+
+@benchmark
+def manpages(quick: bool):
+    spec = manpage_spec(1000 if quick else 5000)
+    # At least two, so the pools are exercised even on a single CPU
+    workers = max(2, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        serial = EasyDoc(spec, 1)
+        serial.build_pages(processes=1)
+        parallel = EasyDoc(spec, 1)
+        parallel.build_pages(processes=workers)
+        outputs = []
+        for doc, threads in ((serial, 1), (parallel, workers)):
+            out = os.path.join(tmp, "pages%d" % threads)
+            os.mkdir(out)
+            doc.write_pages(out, True, threads)
+            outputs.append({p.name: p.read_bytes() for p in Path(out).iterdir()})
+        assert outputs[0] == outputs[1], "Parallel manpage generation wrote different pages"
+        out = os.path.join(tmp, "pages1")
+        incremental = os.path.join(tmp, "incremental")
+        os.mkdir(incremental)
+        EasyDoc(spec, 1).update_pages(incremental, True)
+        return {
+            "build_serial": measure(lambda: EasyDoc(spec, 1).build_pages(processes=1), quick),
+            "build_%d_processes" % workers: measure(lambda: EasyDoc(spec, 1).build_pages(processes=workers), quick),
+            "write_compressed_serial": measure(lambda: serial.write_pages(out, True, 1), quick),
+            "write_compressed_%d_threads" % workers: measure(lambda: serial.write_pages(out, True, workers), quick),
+            "update_unchanged": measure(lambda: EasyDoc(spec, 1).update_pages(incremental, True), quick),
+        }
+
+
+def html_nodes(count: int):
+    return [HTMLObject("span").attr("data-index", str(i)).add_class("entry").content("entry") for i in range(count)]
+
+
+@benchmark
+def htmlobject(quick: bool):
+    count = 10000
+    # Warm up, so one-time setup such as logger configuration is not counted per node
+    html_nodes(10)
+    tracemalloc.start()
+    try:
+        nodes = html_nodes(count)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    build = measure(lambda: html_nodes(1), quick)
+    build["retained_bytes"] = retained // count
+    return {
+        "build_node": build,
+        "render_%d_nodes" % count: measure(lambda: HTMLObject("div").extend(nodes).render(io.StringIO()), quick),
+    }
+
+
+STARTUP_CLASSIC = """
+import sys
+sys.path.insert(0, %(root)r)
+from clilib.builders.app import CLIApp
+app = CLIApp(prefix_path="benchapp", app_name="benchapp")
+for i in range(%(commands)d):
+    app.add_subcommand("command%%d" %% i, "command%%d" %% i)
+app.start_app()
+"""
+
+STARTUP_REGISTRY = """
+import sys
+sys.path.insert(0, %(root)r)
+from clilib.builders.registry import run_registry
+run_registry(%(registry)r)
+"""
+
+STARTUP_COMMAND = '''"""
+Synthetic command %d
+"""
+import json
+import argparse
+
+
+def main():
+    pass
+'''
+
+
+def startup_app(directory: Path, commands: int):
+    """
+    Write a CLIApp package with the given number of commands, plus scripts starting it through CLIApp.start_app and
+    through a prebuilt command registry.
+    """
+    package = directory.joinpath("benchapp")
+    package.mkdir()
+    package.joinpath("__init__.py").write_text("")
+    for i in range(commands):
+        package.joinpath("command%d.py" % i).write_text(STARTUP_COMMAND % i)
+    sys.path.insert(0, str(directory))
+    try:
+        app = CLIApp(prefix_path="benchapp", app_name="benchapp")
+        for i in range(commands):
+            app.add_subcommand("command%d" % i, "command%d" % i)
+        registry = directory.joinpath("benchapp.registry")
+        app.write_registry(str(registry))
+    finally:
+        sys.path.remove(str(directory))
+    values = {"root": str(Path(__file__).resolve().parent.parent), "commands": commands, "registry": str(registry)}
+    classic = directory.joinpath("classic.py")
+    classic.write_text(STARTUP_CLASSIC % values)
+    fast = directory.joinpath("fast.py")
+    fast.write_text(STARTUP_REGISTRY % values)
+    return classic, fast
+
+
+@benchmark
+def startup(quick: bool):
+    results = {}
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    with tempfile.TemporaryDirectory() as tmp:
+        classic, fast = startup_app(Path(tmp), 50)
+        for name, script in (("start_app_help", classic), ("run_registry_help", fast)):
+            # Every run starts a fresh interpreter that prints the application's help
+            command = [sys.executable, str(script), "--help"]
+            results[name] = measure(lambda: subprocess.run(command, cwd=tmp, env=env, stdout=subprocess.DEVNULL, check=True), quick)
+            imports = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], cwd=tmp, env=env, stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.PIPE, universal_newlines=True, check=True)
+            results[name]["modules"] = sum(1 for line in imports.stderr.splitlines()
+                                           if line.startswith("import time:") and "self [us]" not in line)
+    return results
+
+
+def nested_data(width: int, depth: int):
+    if depth == 0:
+        return "value"
+    return {"key%d" % i: nested_data(width, depth - 1) for i in range(width)}
+
+
+@benchmark
+def searchable_dict(quick: bool):
+    d = SearchableDict(nested_data(10, 4))
+    path = "key3.key5.key7.key9"
+    list_d = SearchableDict({"items": [{"name": "item%d" % i} for i in range(100)]})
+    results = {
+        "get_path": measure(lambda: d.get_path(path), quick),
+        "get_path_missing": measure(lambda: d.get_path("key3.missing.key1", None), quick),
+        "get_path_list": measure(lambda: list_d.get_path("items[50].name"), quick),
+    }
+    target = SearchableDict()
+    results["set_path"] = measure(lambda: target.set_path("a.b.c.d", 1), quick)
+    accessor = compile_path(path)
+    results["compiled_get"] = measure(lambda: accessor.get(d), quick)
+    paths = ["key3.key5.key7.key%d" % i for i in range(10)]
+    results["get_path_10"] = measure(lambda: [d.get_path(p) for p in paths], quick)
+    results["get_many_10"] = measure(lambda: d.get_many(paths), quick)
+    return results
+
+
+@benchmark
+def configuration_files(quick: bool):
+    results = {}
+    # INI files only nest one level of sections reliably, so they get a flatter document of the same size.
+    formats = (
+        ("ini", INIConfigurationFile, nested_data(90, 2), "key1.key2"),
+        ("json", JSONConfigurationFile, nested_data(20, 3), "key1.key2.key3"),
+        ("yaml", YAMLConfigurationFile, nested_data(20, 3), "key1.key2.key3"),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cls, data, set_path in formats:
+            path = os.path.join(tmp, "config.%s" % name)
+            config = cls(path, auto_create=data)
+            results["%s_load" % name] = measure(lambda: cls(path), quick)
+            results["%s_write" % name] = measure(config.write, quick)
+            results["%s_set" % name] = measure(lambda: config.__setitem__(set_path, "changed"), quick)
+        sections = ["section%d" % i for i in range(5000)]
+        schema = {name: {"name": str, "count": int} for name in sections}
+        data = {name: {"name": "s", "count": i} for i, name in enumerate(sections)}
+        config = JSONConfigurationFile(os.path.join(tmp, "large.json"), schema=schema, auto_create=data)
+        results["json_set_5000_sections_validated"] = measure(lambda: config.__setitem__("section42.count", 7), quick)
+        config = JSONConfigurationFile(os.path.join(tmp, "batch.json"), auto_create=nested_data(20, 2), write_on_set=True)
+        updates = {"key%d.key%d" % (i // 20, i % 20): "changed" for i in range(100)}
+        results["json_write_on_set_100_sets"] = measure(lambda: [config.__setitem__(k, v) for k, v in updates.items()], quick)
+        results["json_write_on_set_update_many_100"] = measure(lambda: config.update_many(updates), quick)
+    return results
+
+
+def legacy_set_path(d: dict, path: str, value):
+    """
+    SearchableDict.set_path as it was before paths were compiled, used by legacy_ini_parse.
+    """
+    path_parts = path.split(".")
+    destination = path_parts.pop()
+    for key in path_parts:
+        if not key:
+            continue
+        li = re.findall(r'\[(\d+)\]', key)
+        if len(li) > 0:
+            k = key.split("[")[0]
+            l = d.get(k)
+            if not isinstance(l, list):
+                raise TypeError("Value for key %s is not a list" % k)
+            d = l[int(li[0])]
+        else:
+            n = d.get(key, None)
+            if n is None:
+                d[key] = SearchableDict()
+            d = d.get(key)
+        if d is None:
+            raise IndexError("Given dictionary does not contain path: %s (key: %s)" % (path, key))
+    d[destination] = value
+
+
+def legacy_ini_parse(file_data: str):
+    """
+    INI parser used by INIConfigurationFile before it parsed files in a single pass, kept to compare against.
+    """
+    data_lines = file_data.splitlines()
+    current_section = None
+    parsed_data = SearchableDict()
+    for line in data_lines:
+        if re.match(r"^;.*|^#.*", line):
+            continue
+        elif re.match(r"^\[([a-zA-Z0-9\._]*)\]", line):
+            section_name = re.findall(r"^\[([a-zA-Z0-9\._]*)\]", line)
+            if len(section_name) > 0:
+                new_current_section = section_name[0]
+                if new_current_section.startswith("."):
+                    current_section = "%s.%s" % (current_section, new_current_section)
+                else:
+                    current_section = new_current_section
+        else:
+            key_value = re.findall(r"^([a-zA-Z0-9_]*)\s+=\s+(.*)", line)
+            if len(key_value) > 0:
+                key, value = key_value[0]
+                if current_section is not None:
+                    legacy_set_path(parsed_data, "%s.%s" % (current_section, key), value)
+                else:
+                    legacy_set_path(parsed_data, key, value)
+    return parsed_data
+
+
+def ini_document(lines: int):
+    """
+    Generate an INI file mixing comments, top level keys, absolute sections, relative ([.name]) sections and empty
+    keys.
+    """
+    output = ["; generated configuration", "name = bench", "version = 1"]
+    section = 0
+    while len(output) < lines:
+        output.append("")
+        output.append("[service%d]" % section)
+        output.append("# service %d" % section)
+        for i in range(10):
+            output.append("option%d = value %d" % (i, i))
+        output.append("[.limits]")
+        output.append(" = unnamed")
+        for i in range(5):
+            output.append("limit%d = %d" % (i, i * 100))
+        output.append("[service%d.hosts]" % section)
+        for i in range(5):
+            output.append("host%d = 10.0.%d.%d" % (i, section % 256, i))
+        section += 1
+    return "\n".join(output[:lines]) + "\n"
+
+
+@benchmark
+def ini_parser(quick: bool):
+    data = ini_document(20000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.ini")
+        with open(path, "w") as f:
+            f.write(data)
+        config = INIConfigurationFile(path)
+    assert legacy_ini_parse(data) == config._parse_file(data), "INI parsers disagree on generated file"
+    return {
+        "legacy_parse_20000_lines": measure(lambda: legacy_ini_parse(data), quick),
+        "parse_20000_lines": measure(lambda: config._parse_file(data), quick),
+    }
+
+
+def routes_document(routes: int):
+    """
+    Generate a JSON document with one top level object per route, each holding strings, lists and nested objects.
+    """
+    data = {"version": 3}
+    for i in range(routes):
+        data["route%d" % i] = {
+            "name": "service \"%d\"" % i,
+            "enabled": i % 2 == 0,
+            "hosts": ["10.%d.%d.%d" % (i // 65536, i // 256 % 256, j) for j in range(20)],
+            "weights": {"w%d" % j: j for j in range(50)},
+        }
+    return data
+
+
+@benchmark
+def lazy_json(quick: bool):
+    routes = 5000
+    # One path near the start, one in the middle and one at the end of the document
+    paths = ["version", "route%d.hosts[3]" % (routes // 2), "route%d.weights.w7" % (routes - 1)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "routes.json")
+        with open(path, "w") as f:
+            json.dump(routes_document(routes), f)
+
+        def read(cls, selected):
+            config = cls(path)
+            return [config[p] for p in selected]
+
+        assert read(JSONConfigurationFile, paths) == read(LazyJSONConfigurationFile, paths), "Lazy JSON read different values"
+        cases = (
+            ("json_read_3_paths", JSONConfigurationFile, paths),
+            ("lazy_read_3_paths", LazyJSONConfigurationFile, paths),
+            ("lazy_read_first_path", LazyJSONConfigurationFile, paths[:1]),
+        )
+        for name, cls, selected in cases:
+            results[name] = measure(lambda: read(cls, selected), quick)
+            results[name]["peak_bytes"] = peak_memory(lambda: read(cls, selected))
+    return results
+
+
+def services_document(services: int):
+    """
+    Generate a YAML-friendly document of services holding every scalar type, lists, nested objects and a dict shared by
+    every service.
+    """
+    shared = {"retries": 3, "backoff": 1.5}
+    data = {"version": 2, "description": "Generated configuration\nwith a multi-line description", "services": {}}
+    for i in range(services):
+        data["services"]["service%d" % i] = {
+            "name": "Service %d" % i,
+            "enabled": i % 3 != 0,
+            "port": 8000 + i,
+            "ratio": i / 7,
+            "owner": None,
+            "labels": ["team-%d" % (i % 10), "tier-%d" % (i % 3), "région"],
+            "endpoints": [{"path": "/api/v%d" % v, "timeout": 30} for v in range(3)],
+            # The same dict under every service, which must be written out in full rather than as a YAML alias
+            "retry": shared,
+        }
+    return data
+
+
+@benchmark
+def yaml_loaders(quick: bool):
+    if not LIBYAML_AVAILABLE:
+        # Nothing to compare the pure Python loader and dumper with
+        return {}
+    data = services_document(500)
+    results = {}
+    files = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, pure_python in (("pure_python", True), ("libyaml", False)):
+            path = os.path.join(tmp, "%s.yaml" % label)
+            config = YAMLConfigurationFile(path, auto_create=data, pure_python=pure_python)
+            results["%s_load" % label] = measure(lambda: YAMLConfigurationFile(path, pure_python=pure_python), quick)
+            results["%s_write" % label] = measure(config.write, quick)
+            with open(path) as f:
+                files[label] = f.read()
+        assert files["pure_python"] == files["libyaml"], "libyaml dumper wrote a different file"
+        assert "&id" not in files["libyaml"], "libyaml dumper wrote aliases"
+        pure = YAMLConfigurationFile(os.path.join(tmp, "libyaml.yaml"), pure_python=True)
+        fast = YAMLConfigurationFile(os.path.join(tmp, "pure_python.yaml"))
+        assert pure.snapshot() == fast.snapshot() == data, "Loaded data differs"
+    return results
+
+
+@benchmark
+def schema_validator(quick: bool):
+    sections = ["section%d" % i for i in range(1000)]
+    schema = {name: {"name": str, "count": int, "enabled": bool, "nested": {"value": str}} for name in sections}
+    document = {name: {"name": "s", "count": i, "enabled": True, "nested": {"value": "v"}} for i, name in enumerate(sections)}
+    return {
+        "validate_1000_sections": measure(lambda: SchemaValidator(schema).validate(document), quick),
+        "validate_1000_sections_strict": measure(lambda: SchemaValidator(schema, strict=True).validate(document), quick),
+    }
+
+
+@benchmark
+def event_manager(quick: bool):
+    manager = EventManager()
+    received = []
+    manager.on("event", received.append)
+    for i in range(100):
+        manager.on("other%d" % i, received.append)
+    data = {"value": 1}
+
+    def dispatch():
+        manager("event", data)
+        received.clear()
+
+    return {"dispatch": measure(dispatch, quick)}
+
+
+def compare(results: dict, previous: dict):
+    print("\ncompared to %s (clilib %s):" % (previous.get("timestamp", "?"), previous.get("clilib_version", "?")))
+    for bench, metrics in results["results"].items():
+        for metric, value in metrics.items():
+            old = previous.get("results", {}).get(bench, {}).get(metric, None)
+            if old is None:
+                continue
+            print("  %-45s %8.2fx" % ("%s.%s" % (bench, metric), value["best_us"] / old["best_us"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run clilib benchmarks")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON file to write results to")
+    parser.add_argument("-k", "--filter", default=None, help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--quick", action="store_true", help="Take fewer samples")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare with")
+    args = parser.parse_args()
+    results = {
+        "clilib_version": clilib.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {}
+    }
+    for bench in BENCHMARKS:
+        if args.filter is not None and args.filter not in bench.__name__:
+            continue
+        metrics = bench(args.quick)
+        results["results"][bench.__name__] = metrics
+        for metric, value in metrics.items():
+            line = "%-45s %12.2fus best %12.2fus median" % ("%s.%s" % (bench.__name__, metric), value["best_us"], value["median_us"])
+            if "peak_bytes" in value:
+                line += " %10.1fKB peak" % (value["peak_bytes"] / 1024)
+            if "retained_bytes" in value:
+                line += " %10dB retained" % value["retained_bytes"]
+            if "modules" in value:
+                line += " %10d modules" % value["modules"]
+            print(line)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("results written to %s" % args.output)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,8 @@ clilib is a python library for speeding up development of command-line applicati
 the tools included in clilib can be used in any application. Logging and Configuration loading in particular are
 not limited to command line applications.
 """
+from time import perf_counter as _perf_counter
+
 __version__ = "3.7.4"
+# Used by clilib.util.profiling to measure import time of applications.
+_IMPORTED_AT = _perf_counter()
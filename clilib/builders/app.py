@@ -1,17 +1,22 @@
-import gzip
+import builtins
 import importlib
 import argparse
 import inspect
 import json
 import os
 import re
+import sys
 import types
+from html import escape
 from pathlib import Path
 from typing import Any
 from sys import exit
+import clilib
+from clilib.builders.docstring import parse_docstring
 from clilib.builders.spec import SpecBuilder
 from clilib.util.logging import Logging
 from clilib.util.arg_tools import arg_tools
+from clilib.util.profiling import StartupProfile
 
 DEFAULT_FLAG_SPEC = {
     "names": [],
@@ -28,80 +33,419 @@ DEFAULT_POSITIONAL_SPEC = {
 }
 
 
-def manpages(obj, section: int = 1, output_dir=None, compressed: bool = False):
+def manpages(obj, section: int = 1, output_dir=None, compressed: bool = False, workers: int = None, processes: int = 1, incremental: bool = False):
     """
     Generate manpages for object based on generated EasyCLI application
     :param obj: Object to generate manpages for
     :param section: Destination man section for generated manpages
     :param output_dir: Output directory for generated manpages
     :param compressed: Generate gzipped manpages instead of plaintext.
+    :param workers: Number of threads used to compress and write pages. Default is the number of available CPUs, use 1
+    to write serially.
+    :param processes: Number of worker processes used to build pages. Default is to build them serially, which is
+    fastest for most applications since a page renders in tens of microseconds. Only worth raising for trees with many
+    thousands of commands on multi-core machines, see the manpages benchmark in benchmarks/run.py. The calling script
+    must then guard its entry point with if __name__ == "__main__" on platforms that spawn worker processes (macOS,
+    Windows).
+    :param incremental: Only regenerate pages whose command specification changed since the last incremental run into
+    output_dir, keeping a manifest file there. Pages of commands that no longer exist are removed, but only if the
+    manifest lists them. Default is to rewrite every page and leave other files alone.
     :return:
     """
-    print("Generating manpages in compressed mode ...")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if compressed:
+        print("Generating manpages in compressed mode ...")
+    else:
+        print("Generating manpages ...")
     e = EasyCLI(obj, execute=False)
     d = EasyDoc(e.spec.build(), section)
-    d.build_pages()
     if output_dir is None:
         output_dir = Path(os.getcwd())
     else:
         output_dir = Path(output_dir)
     if not output_dir.exists():
         output_dir.mkdir(parents=True)
-    for fn, text in d.manpages.items():
-        fn = "%s.%d.gz" % (fn, section)
-        dest = output_dir.joinpath(fn)
-        print("Writing manpage [%s] to [%s] ... " % (fn, dest))
-        if compressed:
-            with gzip.open(str(dest), 'w') as f:
-                f.write(text)
-        else:
-            with open(str(dest), 'w') as f:
-                f.write(text)
+    if incremental:
+        written, removed = d.update_pages(output_dir, compressed, workers, processes)
+        print("Wrote %d manpages, removed %d from [%s]" % (len(written), len(removed), output_dir))
+    else:
+        d.build_pages(processes=processes)
+        written = d.write_pages(output_dir, compressed, workers)
+        print("Wrote %d manpages to [%s]" % (len(written), output_dir))
+    return d
+
+
+def htmldoc(obj, output_path=None, title: str = None):
+    """
+    Generate a single HTML document for object based on generated EasyCLI application
+    :param obj: Object to generate documentation for
+    :param output_path: Output file for documentation. Default is <name>.html in the current directory
+    :param title: Document title. Default is the name of the application
+    :return:
+    """
+    e = EasyCLI(obj, execute=False)
+    d = EasyDoc(e.spec.build())
+    if output_path is None:
+        output_path = Path(os.getcwd()).joinpath("%s.html" % d.spec["name"])
+    with open(str(output_path), "w") as f:
+        d.write_html(f, title)
+    print("Wrote HTML documentation to [%s]" % output_path)
     return d
 
+
+def _write_manpage(dest: Path, text: str, compressed: bool):
+    import gzip
+    data = text.encode()
+    if compressed:
+        data = gzip.compress(data, mtime=0)
+    with open(str(dest), 'wb') as f:
+        f.write(data)
+
+
+def _build_manpage_chunk(section: int, pages: list):
+    return [(name, EasyDoc.render_page(spec, section)) for name, spec in pages]
+
+
+def _spec_json_default(value):
+    if isinstance(value, type):
+        return "%s.%s" % (value.__module__, value.__qualname__)
+    return repr(value)
+
+
+COMPILED_HEADER = "# Generated by clilib %s from %s.%s. Do not edit, regenerate with clilib.builders.app.compile_cli."
+
+
+def _literal(value):
+    import ast
+    if isinstance(value, type):
+        if getattr(builtins, value.__name__, None) is not value:
+            raise ValueError("Unable to compile argument type %s, only builtin types are supported" % repr(value))
+        return value.__name__
+    text = repr(value)
+    try:
+        if ast.literal_eval(text) == value:
+            return text
+    except (ValueError, SyntaxError):
+        pass
+    raise ValueError("Unable to compile value %s, only literal values are supported" % text)
+
+
+def _call(target: str, args: list, kwargs: dict):
+    params = [_literal(a) for a in args]
+    params += ["%s=%s" % (k, _literal(v)) for k, v in kwargs.items()]
+    return "%s(%s)" % (target, ", ".join(params))
+
+
+def _compile_arguments(lines: list, var: str, spec: dict):
+    for pos in spec["positionals"]:
+        pos = dict(pos)
+        name = pos.pop("name")
+        lines.append("    %s" % _call("%s.add_argument" % var, [name], pos))
+    for flag in spec["flags"]:
+        flag = dict(flag)
+        names = flag.pop("names")
+        lines.append("    %s" % _call("%s.add_argument" % var, names, flag))
+
+
+def _compile_subcommands(lines: list, var: str, spec: dict, counter: list):
+    for sub in spec["subcommands"]:
+        counter[0] += 1
+        sub_var = "p%d" % counter[0]
+        kwargs = {"help": sub["desc"], "description": sub["desc"], "aliases": sub.get("aliases", [])}
+        lines.append("    %s = %s" % (sub_var, _call("%s.add_parser" % var, [sub["name"]], kwargs)))
+        _compile_arguments(lines, sub_var, sub)
+        if len(sub.get("subcommands", [])) > 0:
+            sp_var = "sp%d" % counter[0]
+            kwargs = {"dest": sub["name"], "description": spec["desc"]}
+            lines.append("    %s = %s" % (sp_var, _call("%s.add_subparsers" % sub_var, [], kwargs)))
+            _compile_subcommands(lines, sp_var, sub, counter)
+
+
+def _source_hashes(modules):
+    import hashlib
+    hashes = {}
+    for name in sorted(modules):
+        source = getattr(sys.modules.get(name, None), "__file__", None)
+        if source is None:
+            raise ValueError("Unable to compile CLI from module %s without a source file" % name)
+        with open(source, "rb") as f:
+            hashes[os.path.abspath(source)] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+
+def compile_cli(obj, output_path: str = None, print_return: bool = False, dump_json: bool = True):
+    """
+    Generate a standalone python module containing the fully resolved argument parser and dispatch table of the EasyCLI
+    application for the given object. Console scripts can call the generated module's main() to skip class introspection
+    and specification building on every start. Use compiled_is_stale to find out whether the generated module needs to be
+    regenerated.
+    :param obj: Object to generate the module for. It must be importable, so it cannot be defined in __main__.
+    :param output_path: Path to write the generated module to. If None, the module source is only returned.
+    :param print_return: Print return value of the executed method, same as the EasyCLI option.
+    :param dump_json: Dump dict or list return values to json before printing, same as the EasyCLI option.
+    :return: Generated module source
+    """
+    if obj.__module__ == "__main__" or "<locals>" in obj.__qualname__:
+        raise ValueError("Unable to compile %s, object must be importable" % obj.__qualname__)
+    e = EasyCLI(obj, execute=False)
+    spec = e.spec.build()
+    top = obj.__qualname__.split(".")[0]
+    lines = [
+        COMPILED_HEADER % (clilib.__version__, obj.__module__, obj.__qualname__),
+        "import argparse",
+        "import json",
+        "import sys",
+        "",
+        "CLILIB_VERSION = %s" % repr(clilib.__version__),
+        "SOURCES = {",
+    ]
+    for source, digest in _source_hashes(e._modules).items():
+        lines.append("    %s: %s," % (repr(source), repr(digest)))
+    lines += [
+        "}",
+        "PRINT_RETURN = %s" % repr(print_return),
+        "DUMP_JSON = %s" % repr(dump_json),
+    ]
+    if e._isclass:
+        lines.append("DISPATCH = {")
+        for path, (dest, chain) in e.dispatch.items():
+            if path == () and dest is not None:
+                dest = "subcommand"
+            lines.append("    %s: %s," % (repr(path), repr((dest, chain))))
+        lines.append("}")
+    lines += [
+        "",
+        "",
+        "def _target():",
+        "    from %s import %s" % (obj.__module__, top),
+        "    return %s" % obj.__qualname__,
+        "",
+        "",
+        "def build_parser():",
+    ]
+    if e._isclass:
+        lines.append("    parser = %s" % _call("argparse.ArgumentParser", [], {"description": spec.get("desc", "")}))
+        _compile_arguments(lines, "parser", spec)
+        if len(spec["subcommands"]) > 0:
+            kwargs = {"dest": "subcommand", "description": "Available Subcommands"}
+            lines.append("    subparsers = %s" % _call("parser.add_subparsers", [], kwargs))
+            _compile_subcommands(lines, "subparsers", spec, [0])
+    else:
+        lines.append("    parser = %s" % _call("argparse.ArgumentParser", [], {"description": spec.get("desc", None)}))
+        _compile_arguments(lines, "parser", spec)
+    lines += [
+        "    return parser",
+        "",
+        "",
+        "def main(argv=None):",
+        "    parser = build_parser()",
+        "    args = parser.parse_args(argv)",
+    ]
+    if e._isclass:
+        lines += [
+            "    path = ()",
+            "    dest, chain = DISPATCH[path]",
+            "    while dest is not None:",
+            "        name = getattr(args, dest, None)",
+            "        if (path + (name,)) not in DISPATCH:",
+            "            if len(path) > 0:",
+            "                print(\"Invalid arguments!\")",
+            "            parser.print_help()",
+            "            sys.exit(1)",
+            "        path += (name,)",
+            "        dest, chain = DISPATCH[path]",
+            "    ins = None",
+            "    for attr, kwargs in chain:",
+            "        target = _target() if attr is None else getattr(ins, attr)",
+            "        ins = target(**{k: getattr(args, k) for k in kwargs})",
+        ]
+    else:
+        lines.append("    ins = _target()(**vars(args))")
+    lines += [
+        "    if ins is not None and PRINT_RETURN:",
+        "        if isinstance(ins, (dict, list)) and DUMP_JSON:",
+        "            ins = json.dumps(ins)",
+        "        print(ins)",
+        "",
+        "",
+        "if __name__ == \"__main__\":",
+        "    main()",
+        "",
+    ]
+    source = "\n".join(lines)
+    if output_path is not None:
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(output_path), "w") as f:
+            f.write(source)
+    return source
+
+
+def compiled_is_stale(output_path: str, obj=None):
+    """
+    Check whether a module generated by compile_cli is out of date. A module is stale when it is missing, was generated
+    by another version of clilib or any of the source files of the application changed since it was generated.
+    :param output_path: Path of the generated module
+    :param obj: Optionally, the object the module was generated from. If given, the module is regenerated in memory and
+    compared to the file as well.
+    :return: Bool
+    """
+    import ast
+    import hashlib
+    output_path = Path(output_path)
+    if not output_path.exists():
+        return True
+    with open(str(output_path)) as f:
+        generated = f.read()
+    values = {}
+    for node in ast.parse(generated).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            if node.targets[0].id in ("CLILIB_VERSION", "SOURCES", "PRINT_RETURN", "DUMP_JSON"):
+                values[node.targets[0].id] = ast.literal_eval(node.value)
+    if values.get("CLILIB_VERSION", None) != clilib.__version__ or "SOURCES" not in values:
+        return True
+    for source, digest in values["SOURCES"].items():
+        try:
+            with open(source, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() != digest:
+                    return True
+        except OSError:
+            return True
+    if obj is not None:
+        print_return = values.get("PRINT_RETURN", False)
+        dump_json = values.get("DUMP_JSON", True)
+        return compile_cli(obj, print_return=print_return, dump_json=dump_json) != generated
+    return False
+
+
+_HTML_LOGGER = None
+
+
+def _html_logger():
+    global _HTML_LOGGER
+    if _HTML_LOGGER is None:
+        _HTML_LOGGER = Logging("clilib", "HTMLObject").get_logger()
+    return _HTML_LOGGER
+
+
 class HTMLObject:
+    """
+    Single HTML element. Elements are slotted and share one logger. The attribute dict and class list are only created
+    when first used and hold interned names, so documents with many thousands of elements stay cheap to build.
+    """
+    __slots__ = ("name", "id", "inner_content", "_singleton", "_attributes", "_classes", "_children")
+
     def __init__(self, name: str, _id: str = None, singleton: bool = False):
-        self.name = name
-        self.html_attributes = {}
-        self.classes = []
+        self.name = sys.intern(name)
         self.id = _id
         self.inner_content = None
         self._singleton = singleton
-        self.logger = Logging("clilib", "HTMLObject").get_logger()
+        self._attributes = None
+        self._classes = None
+        self._children = None
+
+    @property
+    def logger(self):
+        return _html_logger()
+
+    @property
+    def html_attributes(self):
+        """
+        Attributes of element, created on first use
+        :return: dict
+        """
+        if self._attributes is None:
+            self._attributes = {}
+        return self._attributes
+
+    @html_attributes.setter
+    def html_attributes(self, value: dict):
+        self._attributes = value
+
+    @property
+    def classes(self):
+        """
+        Classes of element, created on first use
+        :return: list
+        """
+        if self._classes is None:
+            self._classes = []
+        return self._classes
+
+    @classes.setter
+    def classes(self, value: list):
+        self._classes = value
 
     def _get_inner_content(self):
+        return "".join(value if isinstance(value, str) else value.build() for value in self._iter_inner_fragments())
+
+    def _iter_inner_fragments(self):
         if self.inner_content is None:
             self.inner_content = ""
         if isinstance(self.inner_content, str):
-            return self.inner_content
+            yield self.inner_content
         elif isinstance(self.inner_content, list):
-            c = HTMLObject("ul")
+            yield HTMLObject._start_tag("ul", None, None, None)
             for value in self.inner_content:
                 if isinstance(value, str):
-                    c.content(HTMLObject("li").content(value), append=True)
-            return c.build()
+                    yield HTMLObject._start_tag("li", None, None, None)
+                    yield value
+                    yield "</li>"
+            yield "</ul>"
         elif isinstance(self.inner_content, HTMLObject):
-            return self.inner_content.build()
+            yield self.inner_content
         else:
             raise TypeError("HTMLObject content requires value type '%s' not '%s'" % (repr(str), repr(type(self.inner_content))))
+        if self._children is not None:
+            yield from self._children
 
     def _build_class_string(self):
         return " class=\"%s\" " % (" ".join(self.classes))
 
+    @staticmethod
+    def _start_tag(name: str, _id: str, attributes, classes, singleton: bool = False):
+        parts = ["<", name]
+        if _id is not None:
+            parts.append(" id=\"%s\" " % _id)
+        if attributes:
+            for attr, value in attributes.items():
+                parts.append(" %s=\"%s\" " % (attr, value))
+        parts.append(" class=\"%s\" " % (" ".join(classes) if classes else ""))
+        parts.append(" />" if singleton else ">")
+        return "".join(parts)
+
     def _build_tag(self):
-        tag = "<%s" % self.name
-        if self.id is not None:
-            tag += " id=\"%s\" " % self.id
-        for attr, value in self.html_attributes.items():
-            tag += " %s=\"%s\" " % (attr, value)
-        tag += self._build_class_string()
-        if self._singleton:
-            tag += " />"
-        else:
-            tag += ">"
-            tag += self._get_inner_content()
-            tag += "</%s>" % self.name
-        return tag
+        return "".join(self.iter_fragments())
+
+    def iter_fragments(self):
+        """
+        Iterate over the HTML of this object and everything nested in it, one fragment at a time. Nested objects are
+        walked with an explicit stack, so no intermediate strings are built and deep trees do not hit the recursion limit.
+        :return: generator of str
+        """
+        stack = [self]
+        while len(stack) > 0:
+            item = stack.pop()
+            if isinstance(item, str):
+                yield item
+                continue
+            yield HTMLObject._start_tag(item.name, item.id, item._attributes, item._classes, item._singleton)
+            if not item._singleton:
+                stack.append("</%s>" % item.name)
+                stack.extend(reversed(list(item._iter_inner_fragments())))
+
+    def render(self, fp):
+        """
+        Write the HTML of this object to a file-like object as it is generated
+        :param fp: Writable text file or io.TextIOBase
+        :return: Number of characters written
+        """
+        written = 0
+        for fragment in self.iter_fragments():
+            fp.write(fragment)
+            written += len(fragment)
+        return written
 
     def __str__(self):
         return self._build_tag()
@@ -115,14 +459,14 @@ class HTMLObject:
             raise AttributeError("HTMLObject does not support changing the '%s' attribute with 'attr'. Please refer to the documentation for the proper way to change this attribute." % name)
         if not isinstance(value, str):
             raise TypeError("HTMLObject attribute requires value type '%s' not '%s'" % (repr(str), repr(type(value))))
-        self.html_attributes[name] = value
+        self.html_attributes[sys.intern(name)] = value
         return self
 
     def add_class(self, name: str):
         if not re.match(r"-?[_a-zA-Z]+[_a-zA-Z0-9-]*", name):
             raise ValueError("Class name must follow standard CSS/HTML class-name standards.")
         if name not in self.classes:
-            self.classes.append(name)
+            self.classes.append(sys.intern(name))
         return self
 
     def remove_class(self, name: str):
@@ -150,10 +494,28 @@ class HTMLObject:
         return self
 
 
+    def extend(self, values):
+        """
+        Add child elements after the content of this element, in order
+        :param values: Iterable of HTMLObject instances or str
+        :return: self
+        """
+        values = list(values)
+        for value in values:
+            if not isinstance(value, (str, HTMLObject)):
+                raise TypeError("HTMLObject children must be '%s' or '%s' not '%s'" % (repr(str), repr(HTMLObject), repr(type(value))))
+        if self._children is None:
+            self._children = values
+        else:
+            self._children.extend(values)
+        return self
+
 class EasyDoc:
     """
     Generate manual pages based on SpecBuilder specification
     """
+    MANIFEST_NAME = ".easydoc-manifest.json"
+
     def __init__(self, spec: dict, section: int = 1):
         """
 
@@ -190,15 +552,24 @@ class EasyDoc:
         :param spec: pre-built SpecBuilder specification
         :return:
         """
-        line = ""
+        return "".join("%s\n\n" % line for line in EasyDoc.flag_lines(spec))
+
+    @staticmethod
+    def flag_lines(spec):
+        """
+        Describe each flag and positional of given specification on a line of its own
+        :param spec: pre-built SpecBuilder specification
+        :return: list of str
+        """
+        lines = []
         for flag in spec["flags"]:
-            line += "%s - %s\n\n" % (", ".join(flag["names"]), flag["help"])
+            lines.append("%s - %s" % (", ".join(flag["names"]), flag["help"]))
         for positional in spec["positionals"]:
             if "nargs" in positional:
-                line += "%s [%s ...] - %s\n\n" % (positional["name"].upper(), positional["name"].upper(), positional["help"])
+                lines.append("%s [%s ...] - %s" % (positional["name"].upper(), positional["name"].upper(), positional["help"]))
             else:
-                line += "%s - %s\n\n" % (positional["name"].upper(), positional["help"])
-        return line
+                lines.append("%s - %s" % (positional["name"].upper(), positional["help"]))
+        return lines
 
     def build_page(self, spec):
         """
@@ -206,8 +577,18 @@ class EasyDoc:
         :param spec: pre-built SpecBuilder specification
         :return:
         """
+        return EasyDoc.render_page(spec, self.section)
+
+    @staticmethod
+    def render_page(spec, section: int):
+        """
+        Build manpage from given specification for given manual section and output in groff format.
+        :param spec: pre-built SpecBuilder specification
+        :param section: Destination manual section
+        :return:
+        """
         lines = []
-        lines.append(".TH %s %d" % (spec["name"].upper(), self.section))
+        lines.append(".TH %s %d" % (spec["name"].upper(), section))
         lines.append(".SH NAME")
         lines.append("%s \- %s" % (spec["name"], spec["desc"]))
         lines.append(".SH SYNOPSIS")
@@ -224,20 +605,246 @@ class EasyDoc:
                 lines.append("%s - %s\n" % (sub["name"], sub["desc"]))
         return "\n".join(lines)
 
-    def build_pages(self, processor = None):
+    @staticmethod
+    def page_spec(spec):
+        """
+        Reduce a specification to what is rendered on its own page, nested subcommands are reduced to name and desc
+        :param spec: pre-built SpecBuilder specification
+        :return: dict
+        """
+        page = dict(spec)
+        page["subcommands"] = [{"name": sub["name"], "desc": sub["desc"]} for sub in spec.get("subcommands", [])]
+        return page
+
+    def page_tree(self):
+        """
+        Walk the specification once and list every subcommand page with the information needed to render it. Pages are
+        named after the full subcommand path, joined with '-'.
+        :return: list of (page name, page specification) tuples, where nested subcommands are reduced to name and desc
+        """
+        return list(self.iter_page_tree())
+
+    def iter_page_tree(self):
+        """
+        Generator form of page_tree, pages are produced as the specification is walked.
+        :return: generator of (page name, page specification) tuples
+        """
+        stack = [(self.spec["name"], self.spec)]
+        while len(stack) > 0:
+            prefix, spec = stack.pop()
+            children = []
+            for cmd in spec.get("subcommands", []):
+                name = "%s-%s" % (prefix, cmd["name"])
+                yield name, self.page_spec(cmd)
+                children.append((name, cmd))
+            stack.extend(reversed(children))
+
+    def page_filename(self, name: str, compressed: bool = False):
+        """
+        Get file name of given page
+        :param name: Page name
+        :param compressed: Whether the page is gzipped
+        :return: str
+        """
+        fn = "%s.%d" % (name, self.section)
+        if compressed:
+            fn += ".gz"
+        return fn
+
+    def page_hashes(self, compressed: bool = False):
+        """
+        Hash the specification of every page, including the root page. A page only needs to be regenerated when its
+        hash changes.
+        :param compressed: Whether pages are gzipped
+        :return: dict of page name to sha256 hex digest
+        """
+        import hashlib
+        pages = [(self.spec["name"], self.page_spec(self.spec))] + self.page_tree()
+        hashes = {}
+        for name, spec in pages:
+            data = json.dumps([self.section, compressed, spec], sort_keys=True, default=_spec_json_default)
+            hashes[name] = hashlib.sha256(data.encode()).hexdigest()
+        return hashes
+
+    @staticmethod
+    def read_manifest(output_dir: str):
+        """
+        Read manifest of previously generated pages from given directory
+        :param output_dir: Output directory for manpages
+        :return: dict, or None if there is no valid manifest
+        """
+        try:
+            with open(str(Path(output_dir).joinpath(EasyDoc.MANIFEST_NAME))) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version", None) != clilib.__version__:
+            return None
+        if not isinstance(manifest.get("pages", None), dict):
+            return None
+        return manifest
+
+    @staticmethod
+    def write_manifest(output_dir: str, pages: dict):
+        """
+        Atomically write manifest of generated pages to given directory
+        :param output_dir: Output directory for manpages
+        :param pages: dict of page name to {"hash": ..., "file": ...}
+        :return: void
+        """
+        import tempfile
+        output_dir = Path(output_dir)
+        data = json.dumps({"version": clilib.__version__, "pages": pages}, sort_keys=True, indent=1)
+        fd, tmp = tempfile.mkstemp(dir=str(output_dir), prefix="%s." % EasyDoc.MANIFEST_NAME)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp, str(output_dir.joinpath(EasyDoc.MANIFEST_NAME)))
+        except OSError:
+            os.unlink(tmp)
+            raise
+
+    def build_pages(self, processor = None, processes: int = 1, names=None):
         """
         Recursively build all available manpages
+        :param processor: Callable used to build a page from a specification. Default is build_page
+        :param processes: Number of worker processes to build pages with. Only used with the default processor. Default
+        is to build pages serially.
+        :param names: Only build subcommand pages with these names. Default is to build every page.
         :return:
         """
-        if processor is None:
-            processor = self.build_page
-        for cmd in self.spec["subcommands"]:
-            f = "%s-%s" % (self.spec["name"], cmd["name"])
-            self.manpages[f] = processor(cmd)
-            if "subcommands" in cmd:
-                if len(cmd["subcommands"]) > 0:
-                    d = EasyDoc(cmd, section=self.section)
-                    self.manpages.update(d.manpages)
+        from concurrent.futures import ProcessPoolExecutor
+        pages = self.page_tree()
+        if names is not None:
+            pages = [(name, spec) for name, spec in pages if name in names]
+        if processor is not None or processes <= 1 or len(pages) < processes:
+            if processor is None:
+                processor = self.build_page
+            for name, spec in pages:
+                self.manpages[name] = processor(spec)
+            return
+        chunksize = max(1, len(pages) // (processes * 4))
+        chunks = [pages[i:i + chunksize] for i in range(0, len(pages), chunksize)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for built in executor.map(_build_manpage_chunk, [self.section] * len(chunks), chunks):
+                self.manpages.update(built)
+
+    def write_pages(self, output_dir: str, compressed: bool = False, workers: int = 1, names=None):
+        """
+        Write built manpages to given directory, compressing them on a thread pool if requested.
+        :param output_dir: Output directory for manpages
+        :param compressed: Write gzipped manpages instead of plaintext.
+        :param workers: Number of threads to compress and write pages with.
+        :param names: Only write pages with these names. Default is to write every built page.
+        :return: list of written paths
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        output_dir = Path(output_dir)
+        jobs = []
+        for name, text in self.manpages.items():
+            if names is not None and name not in names:
+                continue
+            jobs.append((output_dir.joinpath(self.page_filename(name, compressed)), text))
+        if workers <= 1:
+            for dest, text in jobs:
+                _write_manpage(dest, text, compressed)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda job: _write_manpage(job[0], job[1], compressed), jobs))
+        return [dest for dest, _ in jobs]
+
+    def update_pages(self, output_dir: str, compressed: bool = False, workers: int = 1, processes: int = 1):
+        """
+        Incrementally regenerate manpages in given directory. A manifest of page hashes is kept in the directory, only
+        pages whose specification changed (or whose file is missing) are built and written, and pages of commands that
+        were removed are deleted.
+        :param output_dir: Output directory for manpages
+        :param compressed: Write gzipped manpages instead of plaintext.
+        :param workers: Number of threads to compress and write pages with.
+        :param processes: Number of worker processes to build pages with.
+        :return: tuple of (list of written paths, list of removed paths)
+        """
+        output_dir = Path(output_dir)
+        manifest = self.read_manifest(output_dir)
+        previous = manifest["pages"] if manifest is not None else {}
+        pages = {}
+        changed = set()
+        for name, digest in self.page_hashes(compressed).items():
+            fn = self.page_filename(name, compressed)
+            pages[name] = {"hash": digest, "file": fn}
+            entry = previous.get(name, None)
+            if not isinstance(entry, dict) or entry.get("hash", None) != digest or entry.get("file", None) != fn \
+                    or not output_dir.joinpath(fn).exists():
+                changed.add(name)
+        self.build_pages(processes=processes, names=changed)
+        written = self.write_pages(output_dir, compressed, workers, names=changed)
+        current = set(entry["file"] for entry in pages.values())
+        removed = []
+        for entry in previous.values():
+            fn = entry.get("file", None) if isinstance(entry, dict) else None
+            if fn is None or fn in current or Path(fn).name != fn:
+                continue
+            path = output_dir.joinpath(fn)
+            if path.exists():
+                path.unlink()
+                removed.append(path)
+        self.write_manifest(output_dir, pages)
+        return written, removed
+
+    @staticmethod
+    def html_section(name: str, spec):
+        """
+        Render documentation for a single command as HTML
+        :param name: Page name of command, used as the section id and to link subcommands
+        :param spec: Page specification of command, as produced by page_spec
+        :return: generator of str
+        """
+        section = HTMLObject("section", name).extend([
+            HTMLObject("h2").content(escape(name)),
+            HTMLObject("p").content(escape(spec["desc"] or "")),
+            HTMLObject("pre").content(escape(EasyDoc.syn_str(spec)))
+        ])
+        options = EasyDoc.flag_lines(spec)
+        if len(options) > 0:
+            section.extend([HTMLObject("h3").content("Options"), HTMLObject("div").content([escape(line) for line in options])])
+        subs = spec.get("subcommands", [])
+        if len(subs) > 0:
+            links = []
+            for sub in subs:
+                link = HTMLObject("a").attr("href", "#%s-%s" % (name, sub["name"])).content(escape(sub["name"]))
+                links.append("%s - %s" % (link.build(), escape(sub["desc"] or "")))
+            section.extend([HTMLObject("h3").content("Subcommands"), HTMLObject("div").content(links)])
+        return section.iter_fragments()
+
+    def html_fragments(self, title: str = None):
+        """
+        Render the whole command tree as a single HTML document, one fragment at a time. Each command is rendered on its
+        own as the specification is walked, so memory use does not grow with the size of the document.
+        :param title: Document title. Default is the name of the root command
+        :return: generator of str
+        """
+        if title is None:
+            title = self.spec["name"]
+        yield "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        yield from HTMLObject("title").content(escape(title)).iter_fragments()
+        yield "</head><body>"
+        yield from self.html_section(self.spec["name"], self.page_spec(self.spec))
+        for name, spec in self.iter_page_tree():
+            yield from self.html_section(name, spec)
+        yield "</body></html>\n"
+
+    def write_html(self, fp, title: str = None):
+        """
+        Stream HTML documentation for the whole command tree to a file-like object
+        :param fp: Writable text file or io.TextIOBase
+        :param title: Document title. Default is the name of the root command
+        :return: Number of characters written
+        """
+        written = 0
+        for fragment in self.html_fragments(title):
+            fp.write(fragment)
+            written += len(fragment)
+        return written
 
 
 class EasyCLI:
@@ -248,7 +855,7 @@ class EasyCLI:
     Subclasses are recursively parsed with EasyCLI again, repeating the process described above.
     """
     args: argparse.Namespace
-    def __init__(self, obj, execute: bool = True, enable_logging: bool = False, debug: bool = False, log_location: str = "/var/log", print_return: bool = False, dump_json: bool = True):
+    def __init__(self, obj, execute: bool = True, enable_logging: bool = False, debug: bool = False, log_location: str = "/var/log", print_return: bool = False, dump_json: bool = True, cache: bool = False, cache_dir: str = None, lazy_parser: bool = False, profile=None):
         """
         Build command line application out of given object
         :param obj: Object to inspect and build application from
@@ -258,50 +865,72 @@ class EasyCLI:
         :param log_location: Directory to create log file(s) if enabled. Default is /var/log
         :param print_return: Print return value of method executed based on command line arguments. Default is false.
         :param dump_json: Dump return statement to json if it is one of dict or list before printing. Default is true.
+        :param cache: Cache the generated specification on disk and reuse it on later runs while the source files of the
+        application are unchanged. Default is false.
+        :param cache_dir: Directory for cached specifications. Default is ~/.cache/clilib
+        :param lazy_parser: Only build argument parsers for the subcommands selected on the command line. Help and error
+        output is unchanged. Default is false.
+        :param profile: Time startup phases and report them once the application ran, see clilib.util.profiling. Either a
+        bool, a StartupProfile instance to record into, or None to follow the CLILIB_PROFILE environment variable.
         """
+        self.profile = StartupProfile.from_env(getattr(obj, "__name__", str(obj)), profile)
+        self.profile.record_import()
         self.logger = Logging("clilib", "EasyCLI", console_log=False, file_log=enable_logging, file_log_location=log_location, debug=debug).get_logger()
         self.print_return = print_return
         self.dump_json = dump_json
-        self._obj = obj
-        self._isclass = inspect.isclass(obj)
-        self._isfunc = isinstance(obj, types.FunctionType)
-        self._ismethod = inspect.ismethod(obj)
-        if not isinstance(obj, types.FunctionType) and not inspect.isclass(obj):
-            raise TypeError("EasyCLI requires class or method type, not %s" % str(type(obj)))
-        self.name = obj.__name__.replace("_", "-").lower()
-        self.logger.info("EasyCLI analyzing given object: %s" % self.name)
-        if obj.__doc__ is None:
-            self.logger.fatal("%s: Missing documentation: raising AttributeError" % self.name)
-            raise AttributeError("EasyCLI requires that your code is documented so that it can generate help information and ensure argument types. Documentation missing from: %s " % self.name)
-        self.desc = obj.__doc__.strip()
-        if self._isclass and not hasattr(obj, "__init__"):
-            self.logger.fatal("Object is a class, but is missing init method, so exiting ...")
-            raise AttributeError("Object is a class, but is missing init method, so exiting ...")
-        if self._isclass:
-            self.desc += "\n%s" % obj.__init__.__doc__.strip()
-        self.anno = {}
-        if self._isfunc:
-            self.logger.info("Object is function ...")
-            self.anno = obj.__annotations__
-        elif self._isclass:
-            self.logger.info("Object is class ...")
-            self.anno = obj.__init__.__annotations__
-        self.flag_spec = []
-        self.positional_spec = []
-        self._shortnames = ["h"]
-        self.subcommand_spec = []
-        self.sub_map = {}
-        if self._isclass:
-            self.sub_map["_class"] = self._obj.__name__
-        else:
-            self.sub_map = self._obj.__name__
-        self.spec: SpecBuilder = SpecBuilder(self.name, self._get_help_string())
-        self.aliases = re.findall(r':alias (.*):', self.desc)
-        if self.aliases is not None:
-            for alias in self.aliases:
-                self.spec.add_alias(alias)
-        self._get_arguments()
-        self._setup_argparse()
+        self.lazy_parser = lazy_parser
+        self._parser = None
+        with self.profile.phase("introspection"):
+            self._obj = obj
+            self._isclass = inspect.isclass(obj)
+            self._isfunc = isinstance(obj, types.FunctionType)
+            self._ismethod = inspect.ismethod(obj)
+            if not isinstance(obj, types.FunctionType) and not inspect.isclass(obj):
+                raise TypeError("EasyCLI requires class or method type, not %s" % str(type(obj)))
+            self.name = obj.__name__.replace("_", "-").lower()
+            self.logger.info("EasyCLI analyzing given object: %s" % self.name)
+            if obj.__doc__ is None:
+                self.logger.fatal("%s: Missing documentation: raising AttributeError" % self.name)
+                raise AttributeError("EasyCLI requires that your code is documented so that it can generate help information and ensure argument types. Documentation missing from: %s " % self.name)
+            if self._isclass and not hasattr(obj, "__init__"):
+                self.logger.fatal("Object is a class, but is missing init method, so exiting ...")
+                raise AttributeError("Object is a class, but is missing init method, so exiting ...")
+            self._doc = parse_docstring(obj)
+            self.desc = self._doc.text
+            self.anno = {}
+            if self._isfunc:
+                self.logger.info("Object is function ...")
+                self.anno = obj.__annotations__
+            elif self._isclass:
+                self.logger.info("Object is class ...")
+                self.anno = obj.__init__.__annotations__
+            self.flag_spec = []
+            self.positional_spec = []
+            self._shortnames = ["h"]
+            self.subcommand_spec = []
+            self.sub_map = {}
+            self.dispatch = {}
+            self._modules = {obj.__module__}
+            if self._isclass:
+                self.sub_map["_class"] = self._obj.__name__
+            else:
+                self.sub_map = self._obj.__name__
+            self.spec: SpecBuilder = SpecBuilder(self.name, self._get_help_string())
+            self._cache = None
+            if cache:
+                from clilib.builders.cache import SpecCache
+                self._cache = SpecCache(cache_dir)
+            cached = self._load_cached()
+            if not cached:
+                self.aliases = self._doc.aliases
+                for alias in self.aliases:
+                    self.spec.add_alias(alias)
+                self._get_arguments()
+        with self.profile.phase("spec build"):
+            self._setup_argparse()
+        if not cached and self._cache is not None:
+            with self.profile.phase("introspection"):
+                self._save_cached()
         if execute:
             self.execute_cli()
 
@@ -312,107 +941,135 @@ class EasyCLI:
         :return:
         """
         self.logger.info("Executing generated CLI application for [%s]" % self.name)
-        self.logger.info("Argparse spec: %s" % str(self.spec.build()))
-        if self._isfunc:
-            self.args = arg_tools.build_simple_parser(self.spec.build())
-            self.logger.info(self.args)
-            self._obj(**vars(self.args))
-        elif self._isclass:
-            self.args = arg_tools.build_full_cli(self.spec.build())
-            self.logger.info(self.args)
-            if len(self.subcommand_spec) > 0:
-                if self.args.subcommand not in self.sub_map:
-                    arg_tools.parser.print_help()
-                    exit(1)
-                self._resolve_subcommand_path("subcommand")
+        completed = False
+        try:
+            with self.profile.phase("spec build"):
+                spec = self.spec.freeze()
+            if self._isfunc:
+                self.args = arg_tools.build_simple_parser(spec, profile=self.profile)
+                self.logger.info(self.args)
+                with self.profile.phase("dispatch"):
+                    kwargs = vars(self.args)
+                self._obj(**kwargs)
+            elif self._isclass:
+                self.args = arg_tools.build_full_cli(spec, lazy=self.lazy_parser, profile=self.profile)
+                self.logger.info(self.args)
+                self._dispatch(self.args, arg_tools.parser)
+            completed = True
+        finally:
+            # Budgets are only checked when the application finished normally, so they never replace its own exit
+            self.profile.emit(check=completed)
+
+    def run(self, argv: list = None):
+        """
+        Parse given arguments and execute the application. The parser is built on the first call and reused afterwards,
+        and neither arg_tools.parser nor self.args are modified, so one EasyCLI instance can process any number of
+        argument lists in-process.
+        :param argv: Arguments to parse, without the program name. Default is sys.argv[1:]
+        :return: Exit code, 0 on success
+        """
+        if self._parser is None:
+            with self.profile.phase("argparse construction"):
+                self._parser = arg_tools.build_cli_parser(self.spec.freeze())
+        try:
+            with self.profile.phase("parse"):
+                args = self._parser.parse_args(argv)
+            self.logger.info(args)
+            if self._isfunc:
+                with self.profile.phase("dispatch"):
+                    kwargs = vars(args)
+                self._obj(**kwargs)
             else:
-                self._obj(**self._get_func_kwargs(self._obj))
+                self._dispatch(args, self._parser)
+        except SystemExit as sys_exit:
+            if sys_exit.code is None:
+                return 0
+            if isinstance(sys_exit.code, int):
+                return sys_exit.code
+            print(sys_exit.code, file=sys.stderr)
+            return 1
+        return 0
 
-    def _get_help_string(self):
-        desc_lines = self.desc.split("\n")
-        final = []
-        for l in desc_lines:
-            l = l.strip()
-            if not l.startswith(":"):
-                final.append(l)
-        return " ".join(final)
-
-    def _get_func_kwargs(self, obj):
-        if inspect.isclass(obj):
-            self.logger.info("object [%s] is class" % self.name)
-            arg_spec = inspect.getfullargspec(obj.__init__)
-        elif inspect.ismethod(obj):
-            self.logger.info("object [%s] is method" % self.name)
-            arg_spec = inspect.getfullargspec(obj)
-        elif inspect.isfunction(obj):
-            self.logger.info("object [%s] is function" % self.name)
-            arg_spec = inspect.getfullargspec(obj)
+    def run_many(self, argvs):
+        """
+        Run the application once for every argument list in given iterable, reusing the same parser.
+        :param argvs: Iterable of argument lists
+        :return: List of exit codes
+        """
+        return [self.run(argv) for argv in argvs]
+
+    def _load_cached(self):
+        if self._cache is None:
+            return False
+        entry = self._cache.load(self._obj)
+        if entry is None:
+            self.logger.info("No valid cached specification for [%s]" % self.name)
+            return False
+        self.logger.info("Loaded cached specification for [%s] from [%s]" % (self.name, self._cache.entry_path(self._obj)))
+        spec = entry["spec"]
+        self.aliases = spec["aliases"]
+        for alias in self.aliases:
+            self.spec.add_alias(alias)
+        self.flag_spec = spec["flags"]
+        self.positional_spec = spec["positionals"]
+        self.subcommand_spec = [SpecBuilder.from_spec(sub) for sub in spec["subcommands"]]
+        self.sub_map = entry["sub_map"]
+        self.dispatch = entry["dispatch"]
+        self._modules = set(entry["modules"])
+        return True
+
+    def _save_cached(self):
+        if self._cache.save(self._obj, self.spec.build(), self.sub_map, self.dispatch, self._modules):
+            self.logger.info("Cached specification for [%s] at [%s]" % (self.name, self._cache.entry_path(self._obj)))
         else:
-            raise TypeError("Unable to gather arguments from non-class or non-function types, got (%s)" % str(type(obj)))
-        self.logger.info("Arg spec for [%s]: %s" % (obj.__name__, arg_spec))
-        arg_spec.args.remove("self")
-        arg_dict = {}
-        for arg in arg_spec.args:
-            arg_dict[arg] = getattr(self.args, arg)
-        return arg_dict
-
-    def _resolve_subcommand_path(self, sub: str):
-        ins = self._obj(**self._get_func_kwargs(self._obj))
-        subcommand_name = sub
-        obj = self._obj
-        sub_map = self.sub_map
-        while inspect.isclass(obj):
-            self.logger.info("Object is [%s] Subcommand Name is [%s]" % (obj.__name__, subcommand_name))
-            if subcommand_name not in self.args:
-                # replace alias
-                if isinstance(sub_map, dict):
-                    subcommand_name = sub_map["_class"].lower()
-            if subcommand_name in self.args:
-                subcommand_name = getattr(self.args, subcommand_name)
-                if subcommand_name in sub_map:
-                    if isinstance(sub_map[subcommand_name], dict):
-                        if hasattr(ins, sub_map[subcommand_name]["_class"]):
-                            obj = getattr(ins, sub_map[subcommand_name]["_class"])
-                            ins = obj(**self._get_func_kwargs(obj))
-                            sub_map = sub_map[subcommand_name]
-                        else:
-                            print("clilib: EasyCLI: unable to find member %s in object %s." % (sub_map[subcommand_name]["_class"], str(ins)))
-                            exit(1)
-                    elif isinstance(sub_map[subcommand_name], str):
-                        if hasattr(ins, sub_map[subcommand_name]):
-                            obj = getattr(ins, sub_map[subcommand_name])
-                            ins = obj(**self._get_func_kwargs(obj))
-                        else:
-                            print("clilib: EasyCLI: unable to find member %s in object %s." % (sub_map[subcommand_name], str(ins)))
-                            exit(1)
-                    else:
-                        print("clilib: EasyCLI: unable to decipher subcommand path from given arguments")
-                        exit(1)
-                else:
-                    print("Invalid arguments!")
-                    arg_tools.parser.print_help()
-                    exit(1)
+            self.logger.info("Specification for [%s] cannot be cached" % self.name)
+
+    def _get_help_string(self):
+        return self._doc.help
+
+    def _dispatch(self, args: argparse.Namespace, parser: argparse.ArgumentParser):
+        with self.profile.phase("dispatch"):
+            chain = self._resolve(args, parser)
+        ins = None
+        for attr, kwargs in chain:
+            if attr is None:
+                target = self._obj
             else:
-                print("Invalid arguments!")
-                arg_tools.parser.print_help()
+                target = getattr(ins, attr)
+            ins = target(**{k: getattr(args, k) for k in kwargs})
+        if ins is not None and self.print_return:
+            if (isinstance(ins, dict) or isinstance(ins, list)) and self.dump_json:
+                ins = json.dumps(ins)
+            print(ins)
+
+    def _resolve(self, args: argparse.Namespace, parser: argparse.ArgumentParser):
+        # Walk the dispatch table along the selected subcommands and return the chain of calls to make
+        path = ()
+        dest, chain = self.dispatch[path]
+        if dest is not None:
+            dest = "subcommand"
+        while dest is not None:
+            name = getattr(args, dest, None)
+            entry = self.dispatch.get(path + (name,), None)
+            if entry is None:
+                if len(path) > 0:
+                    print("Invalid arguments!")
+                parser.print_help()
                 exit(1)
-        else:
-            if ins is not None and self.print_return:
-                if (isinstance(ins, dict) or isinstance(ins, list)) and self.dump_json:
-                    ins = json.dumps(ins)
-                print(ins)
+            path += (name,)
+            dest, chain = entry
+        self.logger.info("Dispatching subcommand path [%s]" % " ".join(path))
+        return chain
 
     def _setup_argparse(self):
         for flag in self.flag_spec:
-            names = flag["names"]
-            del flag["names"]
-            self.logger.info("Adding flag: %s" % str(flag))
-            self.spec.add_flag(*names, **flag)
+            kwargs = {k: v for k, v in flag.items() if k != "names"}
+            self.logger.info("Adding flag: %s" % str(kwargs))
+            self.spec.add_flag(*flag["names"], **kwargs)
         for positional in self.positional_spec:
-            name = positional["name"]
-            del positional["name"]
-            self.logger.info("Adding positional: %s" % str(positional))
-            self.spec.add_positional(name, **positional)
+            kwargs = {k: v for k, v in positional.items() if k != "name"}
+            self.logger.info("Adding positional: %s" % str(kwargs))
+            self.spec.add_positional(positional["name"], **kwargs)
         for sub in self.subcommand_spec:
             self.logger.info("Adding subcommand: %s" % str(sub))
             self.spec.add_subcommand(sub)
@@ -424,6 +1081,7 @@ class EasyCLI:
             all_args = arg_spec.args.copy()
             if "self" in all_args:
                 all_args.remove("self")
+            self._arg_names = tuple(all_args)
             if arg_spec.defaults is not None:
                 positionals = []
                 while len(all_args) > len(arg_spec.defaults):
@@ -434,12 +1092,17 @@ class EasyCLI:
                 positionals = all_args
             self.positional_spec = self._parse_positionals(positionals)
             self.subcommand_spec = self._parse_subcommands()
+            dest = None
+            if len(self.subcommand_spec) > 0:
+                dest = self.name
+            self.dispatch[()] = (dest, ((None, self._arg_names),))
         elif self._isfunc:
             arg_spec = inspect.getfullargspec(self._obj)
             self.logger.info("Inspecting function [%s] argument specification: %s" % (self.name, str(arg_spec)))
             all_args = arg_spec.args.copy()
             if "self" in all_args:
                 all_args.remove("self")
+            self._arg_names = tuple(all_args)
             if arg_spec.defaults is not None:
                 positionals = []
                 while len(all_args) > len(arg_spec.defaults):
@@ -449,6 +1112,7 @@ class EasyCLI:
             else:
                 positionals = all_args
             self.positional_spec = self._parse_positionals(positionals)
+            self.dispatch[()] = (None, ((None, self._arg_names),))
 
     def _parse_subcommands(self):
         methods = [m for m in self._obj.__dict__ if not m.startswith("_")]
@@ -458,15 +1122,21 @@ class EasyCLI:
             if hasattr(self._obj, method):
                 _m = getattr(self._obj, method)
                 self.logger.info("Inspecting method [%s] from [%s]" % (str(_m), self.name))
-                if _m.__doc__ is not None:
-                    if ":easycli_ignore:" in _m.__doc__:
+                doc = parse_docstring(_m)
+                if doc is not None:
+                    if doc.ignore:
                         self.logger.info("Docstring for method [%s] contains :easycli_ignore:, so ignoring" % str(_m))
                         continue
-                _e = EasyCLI(_m, execute=False)
+                _e = EasyCLI(_m, execute=False, profile=False)
                 method_path = "%s.%s" % (self._obj.__name__, _m.__name__)
+                self._modules.update(_e._modules)
                 self.sub_map[_e.name] = _e.sub_map
                 for alias in _e.spec.aliases:
                     self.sub_map[alias] = _e.sub_map
+                for path, (dest, chain) in _e.dispatch.items():
+                    entry = (dest, ((None, self._arg_names), (_m.__name__, chain[0][1])) + chain[1:])
+                    for name in [_e.name] + _e.spec.aliases:
+                        self.dispatch[(name,) + path] = entry
                 self.logger.info("Adding subcommand: [%s] aliases: (%s)" % (_e.name, ", ".join(_e.spec.aliases)))
                 subcommand_spec.append(_e.spec)
         return subcommand_spec
@@ -485,10 +1155,9 @@ class EasyCLI:
         for positional in positionals:
             self.logger.info("Adding positional argument [%s] for [%s]" % (positional, self.name))
             p = DEFAULT_POSITIONAL_SPEC.copy()
-            help_matches = re.findall(rf":param {re.escape(positional)}: (.*)", self.desc)
             ty = self.anno.get(positional, str)
             p["type"] = ty
-            p["help"] = ", ".join(help_matches)
+            p["help"] = self._doc.param_help(positional)
             p["name"] = positional
             p["metavar"] = positional.upper()
             if ty is list:
@@ -505,10 +1174,9 @@ class EasyCLI:
         for flag, default in flags.items():
             self.logger.info("Adding flag [%s] with default value [%s] to [%s]" % (flag, default, self.name))
             f = DEFAULT_FLAG_SPEC.copy()
-            help_matches = re.findall(rf"\s+:param {re.escape(flag)}: (.*)", self.desc)
             ty = self.anno.get(flag, str)
             f["type"] = ty
-            f["help"] = ", ".join(help_matches)
+            f["help"] = self._doc.param_help(flag)
             f["default"] = default
             names = []
             if len(flag) > 1:
@@ -537,37 +1205,82 @@ class CLIApp:
     Manually build command-line application by passing a name for the subcommand and a path for the module to be executed
     as the subcommand.
     """
-    def __init__(self, prefix_path: str = None, app_name: str = "CLIApp"):
+    def __init__(self, prefix_path: str = None, app_name: str = "CLIApp", profile=None):
         """
 
         :param prefix_path: Prefix to prepend to subcommand paths
         :param app_name: Name of CLI app, used for logging.
+        :param profile: Time startup phases and report them once the app ran, see clilib.util.profiling. Either a bool,
+        a StartupProfile instance to record into, or None to follow the CLILIB_PROFILE environment variable.
         """
+        self.profile = StartupProfile.from_env(app_name, profile)
+        self.profile.record_import()
         self.prefix_path = prefix_path
         self.prefix = False
         if prefix_path is not None:
             self.prefix = True
+        self.app_name = app_name
         self.logger = Logging(app_name).get_logger()
         self.subcommands = {}
+        self.subcommand_help = {}
 
-    def add_subcommand(self, name: str, path: str):
+    def add_subcommand(self, name: str, path: str, help: str = None):
         """
         Add subcommand to this CLI app
         :param name: subcommand name to use
         :param path: path to python module
+        :param help: One-line help for subcommand, used in registry files. Default is the first line of the module docstring
         :return: void
         """
         self.subcommands[name] = path
+        if help is not None:
+            self.subcommand_help[name] = help
+
+    def _module_help(self, path: str):
+        import ast
+        import importlib.util
+        if self.prefix:
+            path = "%s.%s" % (self.prefix_path, path)
+        try:
+            spec = importlib.util.find_spec(path)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or spec.origin is None or not spec.origin.endswith(".py"):
+            return ""
+        with open(spec.origin) as f:
+            doc = ast.get_docstring(ast.parse(f.read()))
+        if doc is None:
+            return ""
+        return doc.strip().split("\n")[0]
+
+    def write_registry(self, path: str):
+        """
+        Write a registry file for this CLI app, to be run with clilib.builders.registry.run_registry. Help for subcommands
+        without explicit help is read from module docstrings without importing the modules.
+        :param path: Path to registry file
+        :return: CommandRegistry
+        """
+        from clilib.builders.registry import CommandRegistry
+        registry = CommandRegistry(self.app_name, self.prefix_path)
+        for name, module in self.subcommands.items():
+            help = self.subcommand_help.get(name, None)
+            if help is None:
+                help = self._module_help(module)
+            registry.add_command(name, module, help)
+        registry.save(path)
+        return registry
 
     def command_parser(self):
         """
         Parse command and return arguments
         :return: Namespace object containing parsed arguments
         """
-        parser = argparse.ArgumentParser(add_help=False)
-        parser.add_argument("-h", "--help", action="help", help="show this help message and exit")
-        parser.add_argument('command', choices=self.subcommands.keys(), nargs=argparse.REMAINDER)
-        args, _ = parser.parse_known_args()
+        with self.profile.phase("argparse construction"):
+            parser = argparse.ArgumentParser(add_help=False)
+            parser.add_argument("-h", "--help", action="help", help="show this help message and exit")
+            parser.add_argument('command', choices=self.subcommands.keys(), nargs=argparse.REMAINDER)
+        with self.profile.phase("parse"):
+            args, _ = parser.parse_known_args()
         if len(args.command) > 0:
             return args
         else:
@@ -586,9 +1299,12 @@ class CLIApp:
                 path = "%s.%s" % (self.prefix_path, path)
             try:
                 # path_parts = path.split(".")
-                module = importlib.import_module(path)
-                if hasattr(module, "main"):
-                    module.main()
+                with self.profile.phase("import"):
+                    module = importlib.import_module(path)
+                with self.profile.phase("dispatch"):
+                    main = getattr(module, "main", None)
+                if main is not None:
+                    main()
                 else:
                     self.logger.fatal("Subcommand %s is missing `main()` function, cannot run." % args.command[0])
                     exit(1)
@@ -611,6 +1327,11 @@ class CLIApp:
         :return: None
         """
         # args, _ = arg_tools.command_parser(self.subcommands.keys())
-        args = self.command_parser()
-        self.logger.debug(args)
-        self.execute_command(args)
+        completed = False
+        try:
+            args = self.command_parser()
+            self.logger.debug(args)
+            self.execute_command(args)
+            completed = True
+        finally:
+            self.profile.emit(check=completed)
@@ -0,0 +1,161 @@
+import builtins
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import clilib
+
+
+class SpecCache:
+    """
+    Persist EasyCLI specifications on disk so that later runs can skip class introspection. Entries are keyed by the
+    clilib version and the modification time and size of every module source file that contributed to the spec, so any
+    change to the application (or an upgrade of clilib) invalidates the cached entry.
+    """
+    def __init__(self, cache_dir: str = None):
+        """
+        :param cache_dir: Directory to store cached specifications in. Default is $XDG_CACHE_HOME/clilib or ~/.cache/clilib
+        """
+        if cache_dir is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME", None)
+            if cache_home:
+                cache_dir = Path(cache_home).joinpath("clilib")
+            else:
+                cache_dir = Path.home().joinpath(".cache").joinpath("clilib")
+        self.cache_dir = Path(cache_dir)
+
+    def entry_path(self, obj):
+        """
+        Get the path of the cache entry for given object
+        :param obj: Class or function EasyCLI was given
+        :return: Path
+        """
+        module = sys.modules.get(obj.__module__, None)
+        source = getattr(module, "__file__", None) or ""
+        key = "%s:%s:%s" % (os.path.abspath(source), obj.__module__, obj.__qualname__)
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return self.cache_dir.joinpath("%s.%s.json" % (obj.__qualname__, digest))
+
+    @staticmethod
+    def source_stamps(modules):
+        """
+        Collect modification time and size for the source files of given modules.
+        :param modules: Iterable of module names
+        :return: dict of source path to [mtime_ns, size], or None if a module has no source file
+        """
+        stamps = {}
+        for name in modules:
+            module = sys.modules.get(name, None)
+            source = getattr(module, "__file__", None)
+            if source is None:
+                return None
+            st = os.stat(source)
+            stamps[os.path.abspath(source)] = [st.st_mtime_ns, st.st_size]
+        return stamps
+
+    @staticmethod
+    def encode_spec(spec: dict):
+        """
+        Convert a built SpecBuilder specification into a JSON-compatible dict, storing argument types by name.
+        :param spec: pre-built SpecBuilder specification
+        :return: dict
+        """
+        encoded = dict(spec)
+        for key in ("flags", "positionals"):
+            args = []
+            for arg in spec.get(key, []):
+                arg = dict(arg)
+                if "type" in arg:
+                    arg["type"] = arg["type"].__name__
+                args.append(arg)
+            encoded[key] = args
+        encoded["subcommands"] = [SpecCache.encode_spec(sub) for sub in spec.get("subcommands", [])]
+        return encoded
+
+    @staticmethod
+    def decode_spec(spec: dict):
+        """
+        Restore a specification created with encode_spec, turning type names back into types.
+        :param spec: encoded specification
+        :return: dict
+        """
+        for key in ("flags", "positionals"):
+            for arg in spec.get(key, []):
+                if "type" in arg:
+                    arg["type"] = getattr(builtins, arg["type"])
+        for sub in spec.get("subcommands", []):
+            SpecCache.decode_spec(sub)
+        return spec
+
+    def load(self, obj):
+        """
+        Load cached entry for given object if it exists and is still valid.
+        :param obj: Class or function EasyCLI was given
+        :return: dict with 'spec', 'sub_map', 'dispatch' and 'modules' keys, or None
+        """
+        path = self.entry_path(obj)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version", None) != clilib.__version__:
+            return None
+        try:
+            if self.source_stamps(entry["modules"]) != entry["sources"]:
+                return None
+            dispatch = {}
+            for path, dest, chain in entry["dispatch"]:
+                dispatch[tuple(path)] = (dest, tuple((attr, tuple(kwargs)) for attr, kwargs in chain))
+        except (OSError, KeyError, ValueError):
+            return None
+        entry["spec"] = self.decode_spec(entry["spec"])
+        entry["dispatch"] = dispatch
+        return entry
+
+    def save(self, obj, spec: dict, sub_map, dispatch: dict, modules):
+        """
+        Write cache entry for given object. Specifications that cannot be represented exactly in JSON are not cached.
+        :param obj: Class or function EasyCLI was given
+        :param spec: pre-built SpecBuilder specification
+        :param sub_map: EasyCLI subcommand map
+        :param dispatch: EasyCLI dispatch table
+        :param modules: Names of modules containing the objects the specification was built from
+        :return: Bool
+        """
+        modules = sorted(modules)
+        sources = self.source_stamps(modules)
+        if sources is None:
+            return False
+        entry = {
+            "version": clilib.__version__,
+            "modules": modules,
+            "sources": sources,
+            "spec": self.encode_spec(spec),
+            "sub_map": sub_map,
+            "dispatch": [[list(path), dest, [[attr, list(kwargs)] for attr, kwargs in chain]] for path, (dest, chain) in dispatch.items()]
+        }
+        try:
+            data = json.dumps(entry)
+        except (TypeError, ValueError):
+            return False
+        if json.loads(data) != entry:
+            # Tuples and other values that do not survive a JSON round trip would come back different.
+            return False
+        path = self.entry_path(obj)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=str(self.cache_dir), prefix=".%s." % path.name)
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp, str(path))
+        except OSError:
+            os.unlink(tmp)
+            return False
+        return True
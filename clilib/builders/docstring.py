@@ -0,0 +1,86 @@
+import re
+import weakref
+
+_DIRECTIVE_RE = re.compile(r":param (\w+): (.*)|:alias (.*):|:(easycli_\w+):")
+_PARSED = weakref.WeakKeyDictionary()
+
+
+class Docstring:
+    """
+    Structured form of an EasyCLI docstring. Parameter help, aliases and :easycli_*: directives are all extracted in a
+    single scan of the text.
+    """
+    def __init__(self, text: str):
+        """
+        :param text: Docstring text to parse
+        """
+        self.text = text
+        self.params = {}
+        self.aliases = []
+        self.directives = set()
+        for match in _DIRECTIVE_RE.finditer(text):
+            name, param_help, alias, directive = match.groups()
+            if name is not None:
+                self.params.setdefault(name, []).append(param_help)
+            elif alias is not None:
+                self.aliases.append(alias)
+            else:
+                self.directives.add(directive)
+        lines = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line.startswith(":"):
+                lines.append(line)
+        self.help = " ".join(lines)
+
+    @property
+    def ignore(self):
+        """
+        Whether the docstring tells EasyCLI to ignore its object
+        :return: Bool
+        """
+        return "easycli_ignore" in self.directives
+
+    def param_help(self, name: str):
+        """
+        Get help text for given parameter
+        :param name: Name of parameter
+        :return: Help text joined from every :param line for the parameter
+        """
+        return ", ".join(self.params.get(name, []))
+
+
+def object_docstring(obj):
+    """
+    Get the full EasyCLI docstring text for an object. Classes include the docstring of their __init__ method.
+    :param obj: Object to get docstring for
+    :return: str, or None if the object is not documented
+    """
+    if obj.__doc__ is None:
+        return None
+    text = obj.__doc__.strip()
+    if isinstance(obj, type):
+        text += "\n%s" % (obj.__init__.__doc__ or "").strip()
+    return text
+
+
+def parse_docstring(obj):
+    """
+    Parse the docstring of given object. Results are memoized per object, so classes and functions that are shared by
+    several command classes are only parsed once.
+    :param obj: Documented class or function
+    :return: Docstring, or None if the object is not documented
+    """
+    try:
+        return _PARSED[obj]
+    except (KeyError, TypeError):
+        pass
+    text = object_docstring(obj)
+    parsed = None
+    if text is not None:
+        parsed = Docstring(text)
+    try:
+        _PARSED[obj] = parsed
+    except TypeError:
+        pass
+    return parsed
@@ -0,0 +1,162 @@
+"""
+Startup-optimized mode for CLIApp applications. A registry file maps command names to module paths and one-line help, so
+listing commands and printing help never imports a subcommand module, and nothing but the selected subcommand (and the
+modules it needs) is imported when a command runs.
+
+Registry files are plain text with one tab-separated record per line, so loading them needs no imports beyond os and sys.
+"""
+import os
+import sys
+
+REGISTRY_HEADER = "# clilib command registry"
+
+
+class CommandRegistry:
+    """
+    Prebuilt map of command names to the modules implementing them. Registries are usually written at build time with
+    CLIApp.write_registry and loaded by the application entry point with run_registry.
+    """
+    def __init__(self, app_name: str = "CLIApp", prefix_path: str = None):
+        """
+        :param app_name: Name of CLI app, used for logging.
+        :param prefix_path: Prefix to prepend to module paths
+        """
+        self.app_name = app_name
+        self.prefix_path = prefix_path
+        self.commands = {}
+        self._logger = None
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            from clilib.util.logging import Logging
+            self._logger = Logging(self.app_name).get_logger()
+        return self._logger
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load registry from file
+        :param path: Path to registry file
+        :return: CommandRegistry
+        """
+        registry = cls()
+        with open(str(path)) as f:
+            if f.readline().rstrip("\n") != REGISTRY_HEADER:
+                raise ValueError("%s is not a clilib command registry" % path)
+            for line in f:
+                record = line.rstrip("\n").split("\t")
+                if record[0] == "app_name":
+                    registry.app_name = record[1]
+                elif record[0] == "prefix_path":
+                    registry.prefix_path = record[1]
+                elif record[0] == "command":
+                    registry.add_command(record[1], record[2], record[3])
+        return registry
+
+    def save(self, path: str):
+        """
+        Atomically write registry to file
+        :param path: Path to registry file
+        :return: void
+        """
+        path = str(path)
+        lines = [REGISTRY_HEADER, "app_name\t%s" % self.app_name]
+        if self.prefix_path is not None:
+            lines.append("prefix_path\t%s" % self.prefix_path)
+        for name, command in self.commands.items():
+            lines.append("command\t%s\t%s\t%s" % (name, command["module"], command["help"]))
+        tmp = "%s.tmp%d" % (path, os.getpid())
+        try:
+            with open(tmp, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def add_command(self, name: str, module: str, help: str = ""):
+        """
+        Register command
+        :param name: Command name
+        :param module: Path to python module implementing the command, relative to prefix_path if set
+        :param help: One-line help for command
+        :return: void
+        """
+        for value in (name, module):
+            if len(value.split()) != 1:
+                raise ValueError("Command names and module paths cannot contain whitespace: %s" % repr(value))
+        self.commands[name] = {"module": module, "help": " ".join(help.split())}
+
+    def module_path(self, name: str):
+        """
+        Get full module path of given command
+        :param name: Command name
+        :return: str
+        """
+        path = self.commands[name]["module"]
+        if self.prefix_path is not None:
+            path = "%s.%s" % (self.prefix_path, path)
+        return path
+
+    def format_help(self, prog: str = None):
+        """
+        Build help message listing every registered command
+        :param prog: Program name. Default is the name of the running script
+        :return: str
+        """
+        if prog is None:
+            prog = os.path.basename(sys.argv[0])
+        lines = ["usage: %s [-h] {%s} ..." % (prog, ",".join(self.commands.keys())), "", "commands:"]
+        width = max([len(name) for name in self.commands.keys()] + [10])
+        for name, command in self.commands.items():
+            lines.append("  %s  %s" % (name.ljust(width), command["help"]))
+        lines += ["", "options:", "  %s  show this help message and exit" % "-h, --help".ljust(width)]
+        return "\n".join(lines) + "\n"
+
+    def execute(self, argv: list = None):
+        """
+        Run the command selected by given arguments. Commands are run the same way as CLIApp.execute_command runs them.
+        :param argv: Command-line arguments, not including the program name. Default is sys.argv[1:]
+        :return: Bool
+        """
+        if argv is None:
+            argv = sys.argv[1:]
+        if len(argv) == 0:
+            sys.stdout.write(self.format_help())
+            sys.exit(1)
+        if argv[0] in ("-h", "--help"):
+            sys.stdout.write(self.format_help())
+            sys.exit(0)
+        command = argv[0]
+        if command not in self.commands:
+            self.logger.fatal("Command not found: %s. Command must be one of %s" % (command, ", ".join(self.commands.keys())))
+            return False
+        import importlib
+        try:
+            module = importlib.import_module(self.module_path(command))
+            if hasattr(module, "main"):
+                module.main()
+            else:
+                self.logger.fatal("Subcommand %s is missing `main()` function, cannot run." % command)
+                sys.exit(1)
+        except ImportError as ex:
+            self.logger.fatal("ImportError encountered in subcommand: %s. This is usually caused by an error in the module or app configuration." % command)
+            print(ex)
+            return False
+        except KeyboardInterrupt:
+            self.logger.warning("User keyboard interrupt!")
+            sys.exit(1)
+        return True
+
+
+def run_registry(path: str, argv: list = None):
+    """
+    Run a CLIApp application from a registry file written by CLIApp.write_registry. Use this in place of
+    CLIApp.start_app in the application entry point for the fastest possible startup.
+    :param path: Path to registry file
+    :param argv: Command-line arguments, not including the program name. Default is sys.argv[1:]
+    :return: Bool
+    """
+    return CommandRegistry.load(path).execute(argv)
@@ -1,3 +1,130 @@
+from types import MappingProxyType
+
+
+class _Node:
+    __slots__ = ()
+
+    def __setattr__(self, key, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __delattr__(self, key):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+
+class FlagSpec(_Node):
+    """
+    Immutable specification of a single flag
+    """
+    __slots__ = ("names", "kwargs")
+
+    def __init__(self, names, kwargs: dict):
+        """
+        :param names: names for flag
+        :param kwargs: kwargs for argparse
+        """
+        object.__setattr__(self, "names", tuple(names))
+        object.__setattr__(self, "kwargs", MappingProxyType(kwargs))
+
+    def to_dict(self):
+        """
+        Get flag specification in dict format
+        :return: dict
+        """
+        flag = {"names": list(self.names)}
+        flag.update(self.kwargs)
+        return flag
+
+
+class PositionalSpec(_Node):
+    """
+    Immutable specification of a single positional argument
+    """
+    __slots__ = ("name", "kwargs")
+
+    def __init__(self, name: str, kwargs: dict):
+        """
+        :param name: name of positional
+        :param kwargs: kwargs for argparse
+        """
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "kwargs", MappingProxyType(kwargs))
+
+    def to_dict(self):
+        """
+        Get positional specification in dict format
+        :return: dict
+        """
+        pos = {"name": self.name}
+        pos.update(self.kwargs)
+        return pos
+
+
+class CommandSpec(_Node):
+    """
+    Immutable specification of a command and its subcommands. Argument names are stored apart from the keyword arguments
+    passed to argparse, so a command specification can be built into parsers any number of times without being copied
+    or modified.
+    """
+    __slots__ = ("name", "desc", "aliases", "positionals", "flags", "subcommands")
+
+    def __init__(self, name: str, desc: str, aliases=(), positionals=(), flags=(), subcommands=()):
+        """
+        :param name: name of command
+        :param desc: help description for command
+        :param aliases: aliases for command
+        :param positionals: PositionalSpec instances for command
+        :param flags: FlagSpec instances for command
+        :param subcommands: CommandSpec instances for subcommands of command
+        """
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "desc", desc)
+        object.__setattr__(self, "aliases", tuple(aliases))
+        object.__setattr__(self, "positionals", tuple(positionals))
+        object.__setattr__(self, "flags", tuple(flags))
+        object.__setattr__(self, "subcommands", tuple(subcommands))
+
+    @classmethod
+    def from_dict(cls, spec: dict):
+        """
+        Create command specification from a specification in dict format
+        :param spec: pre-built SpecBuilder specification
+        :return: CommandSpec
+        """
+        positionals = []
+        for pos in spec.get("positionals", []):
+            positionals.append(PositionalSpec(pos["name"], {k: v for k, v in pos.items() if k != "name"}))
+        flags = []
+        for flag in spec.get("flags", []):
+            flags.append(FlagSpec(flag["names"], {k: v for k, v in flag.items() if k != "names"}))
+        subcommands = [freeze_spec(sub) for sub in spec.get("subcommands", [])]
+        return cls(spec.get("name", None), spec.get("desc", None), spec.get("aliases", []), positionals, flags, subcommands)
+
+    def to_dict(self):
+        """
+        Get command specification in dict format, as accepted by arg_tools and EasyDoc
+        :return: dict
+        """
+        return {
+            "name": self.name,
+            "desc": self.desc,
+            "flags": [flag.to_dict() for flag in self.flags],
+            "aliases": list(self.aliases),
+            "positionals": [pos.to_dict() for pos in self.positionals],
+            "subcommands": [sub.to_dict() for sub in self.subcommands]
+        }
+
+
+def freeze_spec(spec):
+    """
+    Get immutable form of given specification
+    :param spec: pre-built SpecBuilder specification, CommandSpec or SpecBuilder
+    :return: CommandSpec
+    """
+    if isinstance(spec, CommandSpec):
+        return spec
+    if isinstance(spec, SpecBuilder):
+        return spec.freeze()
+    return CommandSpec.from_dict(spec)
 
 
 class SpecBuilder:
@@ -17,20 +144,43 @@ class SpecBuilder:
         self.positionals = []
         self.subcommands = []
 
+    @classmethod
+    def from_spec(cls, spec: dict):
+        """
+        Create SpecBuilder instance from a previously built specification
+        :param spec: pre-built SpecBuilder specification
+        :return: SpecBuilder
+        """
+        builder = cls(spec["name"], spec["desc"])
+        for alias in spec.get("aliases", []):
+            builder.add_alias(alias)
+        for flag in spec.get("flags", []):
+            flag = dict(flag)
+            names = flag.pop("names")
+            builder.add_flag(*names, **flag)
+        for pos in spec.get("positionals", []):
+            pos = dict(pos)
+            name = pos.pop("name")
+            builder.add_positional(name, **pos)
+        for sub in spec.get("subcommands", []):
+            builder.add_subcommand(cls.from_spec(sub))
+        return builder
+
     def build(self):
         """
         Build and return final specification
         :return: dict
         """
-        spec = {
-            "name": self.name,
-            "desc": self.description,
-            "flags": self.flags,
-            "aliases": self.aliases,
-            "positionals": self.positionals,
-            "subcommands": self.subcommands
-        }
-        return spec
+        return self.freeze().to_dict()
+
+    def freeze(self):
+        """
+        Build and return final specification in immutable form, which can be reused for any number of parsers. Flag and
+        positional specifications are shared with this builder rather than copied.
+        :return: CommandSpec
+        """
+        return CommandSpec(self.name, self.description, self.aliases, self.positionals, self.flags,
+                           [sub.freeze() for sub in self.subcommands])
 
     def add_alias(self, alias: str):
         """
@@ -48,11 +198,7 @@ class SpecBuilder:
         :param kwargs: kwargs for argparse
         :return: void
         """
-        flag = {
-            "names": list(args)
-        }
-        flag.update(kwargs)
-        self.flags.append(flag)
+        self.flags.append(FlagSpec(args, kwargs))
 
     def add_positional(self, name: str, **kwargs):
         """
@@ -61,17 +207,13 @@ class SpecBuilder:
         :param kwargs: kwargs for argparse
         :return: void
         """
-        pos = {
-            "name": name
-        }
-        pos.update(kwargs)
-        self.positionals.append(pos)
+        self.positionals.append(PositionalSpec(name, kwargs))
 
     def add_subcommand(self, subcommand: "SpecBuilder"):
         """
-        Builds another SpecBuilder instance as a subcommand
+        Registers another SpecBuilder instance as a subcommand. The instance is kept by reference and built along with
+        this SpecBuilder instance.
         :param subcommand: SpecBuilder instance to register as a subcommand for this SpecBuilder instance
         :return: void
         """
-        sc = subcommand.build()
-        self.subcommands.append(sc)
+        self.subcommands.append(subcommand)
@@ -1,18 +1,60 @@
 from clilib.util.decorators import deprecated
-from clilib.util.dict import SearchableDict, dict_path
+from clilib.util.dict import SearchableDict, compile_path, dict_path, diff_paths
 from clilib.util.util import SchemaValidator, Util
+from contextlib import contextmanager
 from pathlib import Path
 from clilib.config.config import Config
+from clilib.config.lazy_json import LazyJSONObject
+import atexit
+import itertools
+import mmap
+import os
 import re
 import json
+import stat
+import threading
+import weakref
 import yaml
 
+# A line of an INI file is a comment, a section header ([name], group 1) or a key = value pair (groups 2 and 3)
+_INI_LINE_RE = re.compile(r"[;#]|\[([a-zA-Z0-9._]*)\]|([a-zA-Z0-9_]*)\s+=\s+(.*)")
+
+# PyYAML built with libyaml provides C accelerated loaders and dumpers
+LIBYAML_AVAILABLE = hasattr(yaml, "CSafeLoader") and hasattr(yaml, "CSafeDumper")
+
+# JSON is written in chunks of about this many values, counting the items of nested objects and arrays
+_JSON_CHUNK_ITEMS = 10000
+_JSON_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+# fsync policies for configuration file writes
+FSYNC_NEVER = "never"
+FSYNC_FILE = "file"
+FSYNC_FULL = "full"
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_FILE, FSYNC_FULL)
+
+# Configuration files with a delayed write pending, flushed at interpreter exit
+_PENDING_WRITES = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_pending_writes():
+    for config in list(_PENDING_WRITES):
+        config.flush()
+
 
 class ConfigurationFile:
     """
     Configuration File base class
+
+    Configuration data is copy-on-write: setting or deleting a value builds new dictionaries along the changed path and
+    shares everything else with the previous data, which is never modified. Data returned by snapshot() therefore stays
+    consistent for readers while the configuration is being updated.
+
+    Many changes can be applied together with transaction() or update_many(), which validate and write once.
+
+    Changes made to the file by other processes are picked up with reload(), or automatically with watch().
     """
-    def __init__(self, config_path: str, schema: dict = None, schema_strict: bool = False, auto_create: dict = None, write_on_set: bool = False):
+    def __init__(self, config_path: str, schema: dict = None, schema_strict: bool = False, auto_create: dict = None, write_on_set: bool = False, write_delay: float = None, fsync: str = FSYNC_FILE):
         """
         Load a configuration file from a path.
         :param config_path: Path to configuration file
@@ -20,7 +62,16 @@ class ConfigurationFile:
         :param schema_strict: Schema validation is strict, failing if keys are missing from loaded config
         :param auto_create: Dictionary of defaults for auto creation, or None
         :param write_on_set: Boolean value which tells object whether to write to disk when a value in the config is changed.
+        :param write_delay: With write_on_set, write changes from a background thread this many seconds after the first
+        unwritten change instead of immediately, so rapid updates are written once. Pending changes are written by
+        flush(), when leaving a with block and at interpreter exit.
+        :param fsync: When to sync written files to disk. Files are always written to a temporary file that replaces the
+        configuration file once complete. 'file' (default) syncs the temporary file before it is renamed, so a crash
+        leaves either the old or the new file intact. 'full' also syncs the directory, so the rename itself survives a
+        crash. 'never' leaves syncing to the operating system.
         """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy %s, expected one of: %s" % (fsync, ", ".join(FSYNC_POLICIES)))
         self.path = Path(config_path)
         self._config_data = SearchableDict()
         self._schema = schema
@@ -28,13 +79,18 @@ class ConfigurationFile:
         self._validator = None
         self._auto_create = auto_create
         self._write_on_set = write_on_set
+        self._write_delay = write_delay
+        self._fsync = fsync
+        self._lock = threading.RLock()
+        self._transaction = None
+        self._write_timer = None
+        self._watch_callbacks = []
+        self._watcher = None
         if self._schema is not None:
             self._validator = SchemaValidator(self._schema, self._schema_strict)
+        self._file_stat = self._stat_signature()
         self._load_file()
 
-    def _load_config(self):
-        raise NotImplementedError("You must implement this method")
-
     def __call__(self, path: str):
         return self._config_data.get_path(path)
 
@@ -45,22 +101,248 @@ class ConfigurationFile:
         return self._config_data.get_path(item)
 
     def __setitem__(self, item, value):
-        config_data = SearchableDict(self._config_data.copy())
-        config_data.set_path(item, value)
-        if self._validator is not None:
-            self._validator.validate(config_data)
-        self._config_data = config_data
-        if self._write_on_set:
-            self.write()
-    
+        path = compile_path(item)
+        with self._lock:
+            config_data = path.assoc(self._config_data, value)
+            changed_keys = path.changed_keys(self._config_data)
+            if self._transaction is not None:
+                self._transaction.append(changed_keys)
+                self._config_data = config_data
+                return
+            if self._validator is not None:
+                self._validator.validate_path(config_data, changed_keys)
+            self._config_data = config_data
+            self._changed()
+
     def __delitem__(self, key):
-        if key in self._config_data:
-            del self._config_data[key]
-            if self._write_on_set:
-                self.write()
+        with self._lock:
+            if key in self._config_data:
+                config_data = SearchableDict(self._config_data)
+                del config_data[key]
+                self._config_data = config_data
+                if self._transaction is None:
+                    self._changed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+        return False
+
+    def _changed(self):
+        if not self._write_on_set:
+            return
+        if self._write_delay is None:
+            self.write()
+        elif self._write_timer is None:
+            self._write_timer = threading.Timer(self._write_delay, self.flush)
+            self._write_timer.daemon = True
+            _PENDING_WRITES.add(self)
+            self._write_timer.start()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Apply many changes at once. Values set inside the with block are validated together when it ends, and the file
+        is written once (with write_on_set). If the block raises, or validation fails, every change made in it is
+        discarded. Nested transactions are part of the outermost one.
+        :return: context manager
+        """
+        with self._lock:
+            if self._transaction is not None:
+                yield self
+                return
+            original = self._config_data
+            self._transaction = []
+            try:
+                yield self
+                if self._validator is not None:
+                    for changed_keys in self._transaction:
+                        self._validator.validate_path(self._config_data, changed_keys)
+            except BaseException:
+                self._config_data = original
+                raise
+            finally:
+                self._transaction = None
+            if self._config_data is not original:
+                self._changed()
+
+    def update_many(self, values: dict):
+        """
+        Set many paths at once, validating and writing only once
+        :param values: dict of path to value
+        :return: void
+        """
+        with self.transaction():
+            for path, value in values.items():
+                self[path] = value
+
+    def flush(self):
+        """
+        Write changes waiting for a delayed write now
+        :return: void
+        """
+        with self._lock:
+            if self._write_timer is None:
+                return
+            self._write_timer.cancel()
+            self._write_timer = None
+            _PENDING_WRITES.discard(self)
+            self.write()
+
+    @contextmanager
+    def _open_for_write(self):
+        """
+        Open a temporary file next to the configuration file for writing. When the with block ends the temporary file
+        replaces the configuration file, so readers only ever see a complete file. If the block raises, the
+        configuration file is left untouched. Files are synced to disk according to the fsync policy.
+
+        Symlinks are followed, so the file they point to is replaced and the link itself is kept. The mode of the
+        existing file is copied to the new one, and so are its owner and group where the process is allowed to set
+        them. Other metadata, such as ACLs and extended attributes, is not carried over.
+        :return: context manager giving a writable text file
+        """
+        target = Path(os.path.realpath(self.path))
+        tmp = target.with_name(".%s.%d.%d.tmp" % (target.name, os.getpid(), threading.get_ident()))
+        try:
+            with open(tmp, "w") as f:
+                yield f
+                if self._fsync != FSYNC_NEVER:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._copy_ownership(target, tmp)
+            os.replace(tmp, target)
+            self._file_stat = self._stat_signature()
+            if self._fsync == FSYNC_FULL:
+                self._fsync_directory(target.parent)
+        except BaseException:
+            if tmp.exists():
+                tmp.unlink()
+            raise
+
+    @staticmethod
+    def _copy_ownership(source: Path, destination: Path):
+        try:
+            st = os.stat(source)
+        except FileNotFoundError:
+            return
+        os.chmod(destination, stat.S_IMODE(st.st_mode))
+        if not hasattr(os, "chown"):
+            return
+        own = os.stat(destination)
+        if (own.st_uid, own.st_gid) == (st.st_uid, st.st_gid):
+            return
+        try:
+            os.chown(destination, st.st_uid, st.st_gid)
+        except PermissionError:
+            # Only privileged processes can give files away, keep the group if it is one of ours
+            try:
+                os.chown(destination, -1, st.st_gid)
+            except PermissionError:
+                pass
+
+    @staticmethod
+    def _fsync_directory(directory: Path):
+        if not hasattr(os, "O_DIRECTORY"):
+            # Directories cannot be opened for syncing on this platform
+            return
+        fd = os.open(str(directory), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def snapshot(self):
+        """
+        Get the current configuration data. Later changes made through this object are never applied to the returned
+        data, as long as it is not modified in place.
+        :return: SearchableDict
+        """
+        return self._config_data
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino, st.st_dev
+
+    def changed_on_disk(self):
+        """
+        Check whether the file on disk changed since it was last loaded or written by this object. Only file metadata is
+        checked, so this is cheap enough to call often.
+        :return: Bool
+        """
+        return self._stat_signature() != self._file_stat
 
     def reload(self):
-        self._load_config()
+        """
+        Load configuration file from disk again, replacing current data and discarding any delayed write. Watch
+        callbacks are called if any value changed.
+        :return: list of paths whose values changed
+        """
+        with self._lock:
+            if self._write_timer is not None:
+                self._write_timer.cancel()
+                self._write_timer = None
+                _PENDING_WRITES.discard(self)
+            previous = self._config_data
+            self._file_stat = self._stat_signature()
+            self._load_file()
+            changed = self._diff(previous)
+            callbacks = list(self._watch_callbacks)
+        if len(changed) > 0:
+            for callback in callbacks:
+                callback(self, changed)
+        return changed
+
+    def _diff(self, previous):
+        # Paths that differ between previously loaded data and current data
+        return diff_paths(previous, self._config_data)
+
+    def check_reload(self):
+        """
+        Reload configuration file if it changed on disk
+        :return: list of paths whose values changed
+        """
+        if not self.changed_on_disk():
+            return []
+        return self.reload()
+
+    def watch(self, callback, watcher=None):
+        """
+        Reload configuration file automatically when it changes on disk. Files are watched from a background thread
+        shared by every watched configuration file, using inotify on Linux and polling elsewhere.
+        :param callback: Called from the watcher thread with this object and a list of changed paths after each reload
+        that changed a value
+        :param watcher: Optional clilib.config.watcher.ConfigWatcher to use instead of the shared one
+        :return: void
+        """
+        if watcher is None:
+            from clilib.config.watcher import default_watcher
+            watcher = default_watcher()
+        with self._lock:
+            self._watch_callbacks.append(callback)
+            if self._watcher is not None and self._watcher is not watcher:
+                self._watcher.remove(self)
+            self._watcher = watcher
+        watcher.add(self)
+
+    def unwatch(self, callback=None):
+        """
+        Remove watch callback. The file is no longer watched once every callback is removed.
+        :param callback: Callback to remove, or None to remove all callbacks
+        :return: void
+        """
+        with self._lock:
+            if callback is None:
+                self._watch_callbacks = []
+            elif callback in self._watch_callbacks:
+                self._watch_callbacks.remove(callback)
+            if len(self._watch_callbacks) == 0 and self._watcher is not None:
+                self._watcher.remove(self)
+                self._watcher = None
 
     def write(self):
         raise NotImplementedError("You must implement this method")
@@ -75,37 +357,55 @@ class INIConfigurationFile(ConfigurationFile):
     :param schema_strict: Schema validation is strict, failing if keys are missing from loaded config
     :param auto_create: Dictionary of defaults for auto creation, or None
     :param write_on_set: Boolean value which tells object whether to write to disk when a value in the config is changed.
+    :param write_delay: With write_on_set, coalesce changes made within this many seconds into one background write
+    :param fsync: When to sync written files to disk: 'file' (default), 'full' or 'never'
     """
 
+    def _section_node(self, parsed_data: SearchableDict, section: str):
+        # Resolve the dictionary keys of the current section are set in, creating it the way set_path would. Returns None
+        # when the section path runs into a value that is not a dictionary, leaving the error to set_path.
+        node = parsed_data
+        for name in section.split("."):
+            if not name:
+                continue
+            child = node.get(name, None)
+            if child is None:
+                child = node[name] = SearchableDict()
+            elif not isinstance(child, dict):
+                return None
+            node = child
+        return node
+
     def _parse_file(self, file_data):
-        data_lines = file_data.splitlines()
         current_section = None
+        node = None
         parsed_data = SearchableDict()
-        for line in data_lines:
-            if re.match(r"^;.*|^#.*", line):
+        for line in file_data.splitlines():
+            match = _INI_LINE_RE.match(line)
+            if match is None:
                 continue
-            elif re.match(r"^\[([a-zA-Z0-9\._]*)\]", line):
-                section_name = re.findall(r"^\[([a-zA-Z0-9\._]*)\]", line)
-                if len(section_name) > 0:
-                    new_current_section = section_name[0]
-                    if new_current_section.startswith("."):
-                        current_section = "%s.%s" % (current_section, new_current_section)
-                    else:
-                        current_section = new_current_section
-            else:
-                if current_section is not None:
-                    key_value = re.findall(r"^([a-zA-Z0-9_]*)\s+=\s+(.*)", line)
-                    if len(key_value) > 0:
-                        key = key_value[0][0]
-                        value = key_value[0][1]
-                        path = "%s.%s" % (current_section, key)
-                        parsed_data.set_path(path, value)
+            kind = match.lastindex
+            if kind is None:
+                # Comment
+                continue
+            if kind == 1:
+                new_current_section = match.group(1)
+                if new_current_section.startswith("."):
+                    current_section = "%s.%s" % (current_section, new_current_section)
                 else:
-                    key_value = re.findall(r"^([a-zA-Z0-9_]*)\s+=\s+(.*)", line)
-                    if len(key_value) > 0:
-                        key = key_value[0][0]
-                        value = key_value[0][1]
-                        parsed_data.set_path(key, value)
+                    current_section = new_current_section
+                # Sections are only created once a key is set in them
+                node = None
+                continue
+            key, value = match.group(2, 3)
+            if node is None:
+                node = parsed_data if current_section is None else self._section_node(parsed_data, current_section)
+            if node is not None:
+                node[key] = value
+                continue
+            # The section runs into a value that is not a dictionary, let set_path raise the error
+            path = key if current_section is None else "%s.%s" % (current_section, key)
+            parsed_data.set_path(path, value)
         return parsed_data
 
     def _load_file(self):
@@ -127,39 +427,56 @@ class INIConfigurationFile(ConfigurationFile):
             else:
                 raise e
 
-    def _dump_dict(self, data: dict):
-        output = ""
+    def _iter_dict(self, data: dict):
+        # Yields one chunk per run of keys, so the writer is not called for every line
+        lines = []
         for k, v in data.items():
             if isinstance(v, dict):
-                output += "[.%s]\n" % k
-                output += self._dump_dict(v)
+                lines.append("[.%s]\n" % k)
+                yield "".join(lines)
+                lines = []
+                yield from self._iter_dict(v)
             elif isinstance(v, (str, int, float)):
-                output += "%s = %s\n" % (k, v)
+                lines.append("%s = %s\n" % (k, v))
             else:
                 raise TypeError("Unsupported type %s" % type(v))
-        return output
+        if len(lines) > 0:
+            yield "".join(lines)
+
+    def _dump_dict(self, data: dict):
+        return "".join(self._iter_dict(data))
+
+    def _iter_dump(self):
+        data = self._config_data
+        # Top level values come first, in reverse order, followed by the sections.
+        scalars = [(k, v) for k, v in data.items() if isinstance(v, (str, int, float))]
+        for k, v in reversed(scalars):
+            yield "%s = %s\n" % (k, str(v))
+        for k, v in data.items():
+            if isinstance(v, dict):
+                yield "[%s]\n" % k
+                yield from self._iter_dict(v)
+            elif not isinstance(v, (str, int, float)):
+                raise TypeError("Unsupported ini value type: %s" % type(v))
 
     def dump(self):
         """
         Dump configuration to file
         """
-        final = ""
-        for k, v in self._config_data.items():
-            if isinstance(v, dict):
-                final += "[%s]\n" % k
-                final += self._dump_dict(v)
-            elif isinstance(v, (str, int, float)):
-                new_final = "%s = %s\n" % (k, str(v))
-                new_final += final
-                final = new_final
-            else:
-                raise TypeError("Unsupported ini value type: %s" % type(v))
-        return final
+        return "".join(self._iter_dump())
+
+    def dump_to(self, fp):
+        """
+        Write configuration to a file object, section by section, without building the whole file in memory first.
+        Output is the same as dump.
+        :param fp: Writable text file
+        :return: void
+        """
+        fp.writelines(self._iter_dump())
 
     def write(self):
-        with open(self.path, 'w') as f:
-            final_data = self.dump()
-            f.write(final_data)
+        with self._open_for_write() as f:
+            self.dump_to(f)
 
 
 class JSONConfigurationFile(ConfigurationFile):
@@ -170,6 +487,8 @@ class JSONConfigurationFile(ConfigurationFile):
     :param schema_strict: Schema validation is strict, failing if keys are missing from loaded config
     :param auto_create: Dictionary of defaults for auto creation, or None
     :param write_on_set: Boolean value which tells object whether to write to disk when a value in the config is changed.
+    :param write_delay: With write_on_set, coalesce changes made within this many seconds into one background write
+    :param fsync: When to sync written files to disk: 'file' (default), 'full' or 'never'
     """
     def _load_file(self):
         try:
@@ -189,31 +508,214 @@ class JSONConfigurationFile(ConfigurationFile):
             else:
                 raise e
 
-    def write(self, pretty=False):
-        with open(self.path, 'w') as f:
-            if pretty:
-                json.dump(self._config_data, f, indent=4)
+    def dump_to(self, fp, pretty: bool = False):
+        """
+        Write configuration as JSON to a file object, in chunks of about _JSON_CHUNK_ITEMS values. Runs of values that
+        are small enough are encoded together by the C accelerated encoder, larger objects and arrays are written item
+        by item, so neither the whole document nor one large value in it is held in memory as one string. Output is the
+        same as json.dump.
+        :param fp: Writable text file
+        :param pretty: Indent output. Indented JSON is always encoded in pure Python, json.dump already streams it.
+        :return: void
+        """
+        data = self._config_data
+        if pretty or not all(isinstance(key, str) for key in data):
+            # Leave indentation, and converting other key types, to the json module
+            json.dump(data, fp, indent=4 if pretty else None)
+            return
+        self._dump_value(fp, data, set())
+
+    @staticmethod
+    def _count_items(value, limit: int):
+        # Number of items in value and every object or array nested in it, counting stops once it goes over limit
+        count = 0
+        stack = [value]
+        while len(stack) > 0:
+            container = stack.pop()
+            count += len(container)
+            if count > limit:
+                break
+            items = container.values() if isinstance(container, dict) else container
+            if not _JSON_SCALARS.issuperset(map(type, items)):
+                stack.extend(item for item in items if isinstance(item, (dict, list, tuple)))
+        return count
+
+    def _dump_value(self, fp, value, markers: set):
+        is_dict = isinstance(value, dict)
+        if not is_dict and not isinstance(value, (list, tuple)) or self._count_items(value, _JSON_CHUNK_ITEMS) <= _JSON_CHUNK_ITEMS \
+                or is_dict and not all(isinstance(key, str) for key in value):
+            fp.write(json.dumps(value))
+            return
+        if id(value) in markers:
+            raise ValueError("Circular reference detected")
+        markers.add(id(value))
+        fp.write("{" if is_dict else "[")
+        first = True
+        entries = iter(value.items() if is_dict else value)
+        if _JSON_SCALARS.issuperset(map(type, value.values() if is_dict else value)):
+            # Only scalars, written in slices
+            batch = list(itertools.islice(entries, _JSON_CHUNK_ITEMS))
+            while len(batch) > 0:
+                self._write_batch(fp, batch, is_dict, first)
+                first = False
+                batch = list(itertools.islice(entries, _JSON_CHUNK_ITEMS))
+        batch = []
+        batch_items = 0
+        for entry in entries:
+            item = entry[1] if is_dict else entry
+            if not isinstance(item, (dict, list, tuple)):
+                size = 1
+            elif _JSON_SCALARS.issuperset(map(type, item.values() if isinstance(item, dict) else item)):
+                size = len(item) + 1
             else:
-                json.dump(self._config_data, f)
+                size = self._count_items(item, _JSON_CHUNK_ITEMS) + 1
+            if batch_items + size > _JSON_CHUNK_ITEMS and len(batch) > 0:
+                self._write_batch(fp, batch, is_dict, first)
+                first = False
+                batch = []
+                batch_items = 0
+            if size > _JSON_CHUNK_ITEMS:
+                if not first:
+                    fp.write(", ")
+                if is_dict:
+                    fp.write("%s: " % json.dumps(entry[0]))
+                self._dump_value(fp, item, markers)
+                first = False
+            else:
+                batch.append(entry)
+                batch_items += size
+        if len(batch) > 0:
+            self._write_batch(fp, batch, is_dict, first)
+        markers.discard(id(value))
+        fp.write("}" if is_dict else "]")
+
+    @staticmethod
+    def _write_batch(fp, batch: list, is_dict: bool, first: bool):
+        # Encode a run of items together and write them without the surrounding brackets
+        encoded = json.dumps(dict(batch) if is_dict else batch)
+        fp.write(encoded[1:-1] if first else ", " + encoded[1:-1])
+
+    def write(self, pretty=False):
+        with self._open_for_write() as f:
+            self.dump_to(f, pretty)
+
+
+class LazyJSONConfigurationFile(JSONConfigurationFile):
+    """
+    JSON configuration file that is memory mapped instead of loaded. Top level keys, and keys of nested objects, are
+    indexed as paths are looked up, and only values that are read are decoded, so reading a few paths from a very large
+    file takes little memory. Indexing an object still reads all of it, so the first lookup takes about as long as
+    json.load. Objects along a looked up path are never decoded, only the value at the end of it.
+
+    The first change made to the configuration decodes the whole file, after which it behaves like
+    JSONConfigurationFile. A schema also makes the whole file be decoded for validation when it is loaded. The file
+    must not be modified in place while it is mapped, replacing it (as ConfigurationFile.write does) is safe.
+    :param config_path: Path to configuration file
+    :param schema: Validation schema for validating loaded config. This is optional
+    :param schema_strict: Schema validation is strict, failing if keys are missing from loaded config
+    :param auto_create: Dictionary of defaults for auto creation, or None
+    :param write_on_set: Boolean value which tells object whether to write to disk when a value in the config is changed.
+    :param write_delay: With write_on_set, coalesce changes made within this many seconds into one background write
+    :param fsync: When to sync written files to disk: 'file' (default), 'full' or 'never'
+    """
+    def _load_file(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return super()._load_file()
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be mapped, let the json module report the error
+                json.load(f)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        config_data = LazyJSONObject.from_buffer(buffer)
+        if self._validator is not None:
+            self._validator.validate(config_data.decode())
+        self._config_data = config_data
+
+    @property
+    def is_lazy(self):
+        """
+        Whether configuration data is still read lazily from the mapped file
+        :return: Bool
+        """
+        return isinstance(self._config_data, LazyJSONObject)
+
+    def _diff(self, previous):
+        if isinstance(previous, LazyJSONObject) and self.is_lazy:
+            # Compare the JSON text of both mapped files, decoding only values that changed
+            return previous.diff(self._config_data)
+        return super()._diff(previous)
+
+    def _materialize(self):
+        if self.is_lazy:
+            self._config_data = SearchableDict(self._config_data.decode())
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, LazyJSONObject):
+            return value.decode()
+        return value
+
+    def __call__(self, path: str):
+        return self._value(self._config_data.get_path(path))
+
+    def __getitem__(self, item):
+        return self._value(self._config_data.get_path(item))
+
+    def __setitem__(self, item, value):
+        with self._lock:
+            self._materialize()
+            super().__setitem__(item, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._materialize()
+            super().__delitem__(key)
+
+    def dump_to(self, fp, pretty: bool = False):
+        with self._lock:
+            self._materialize()
+        super().dump_to(fp, pretty)
 
 
 class YAMLConfigurationFile(ConfigurationFile):
     """
-    Load YAML configuration file from disk, use auto_create if not None and file does not exist.
+    Load YAML configuration file from disk, use auto_create if not None and file does not exist. Files are loaded and
+    written with PyYAML's libyaml based C loader and dumper when PyYAML was built with libyaml.
     :param config_path: Path to configuration file
     :param schema: Validation schema for validating loaded config. This is optional
     :param schema_strict: Schema validation is strict, failing if keys are missing from loaded config
     :param auto_create: Dictionary of defaults for auto creation, or None
     :param write_on_set: Boolean value which tells object whether to write to disk when a value in the config is changed.
+    :param write_delay: With write_on_set, coalesce changes made within this many seconds into one background write
+    :param fsync: When to sync written files to disk: 'file' (default), 'full' or 'never'
+    :param pure_python: Always use PyYAML's pure Python loader and dumper
     """
     class NoAliasDumper(yaml.SafeDumper):
         def ignore_aliases(self, data):
             return True
 
+    if LIBYAML_AVAILABLE:
+        class CNoAliasDumper(yaml.CSafeDumper):
+            def ignore_aliases(self, data):
+                return True
+    else:
+        CNoAliasDumper = None
+
+    def __init__(self, config_path: str, schema: dict = None, schema_strict: bool = False, auto_create: dict = None, write_on_set: bool = False, write_delay: float = None, fsync: str = FSYNC_FILE, pure_python: bool = False):
+        if pure_python or not LIBYAML_AVAILABLE:
+            self._loader = yaml.SafeLoader
+            self._dumper = YAMLConfigurationFile.NoAliasDumper
+        else:
+            self._loader = yaml.CSafeLoader
+            self._dumper = YAMLConfigurationFile.CNoAliasDumper
+        super().__init__(config_path, schema, schema_strict, auto_create, write_on_set, write_delay, fsync)
+
     def _load_file(self):
         try:
             with open(self.path, 'rb') as f:
-                config_data = yaml.safe_load(f)
+                config_data = yaml.load(f, Loader=self._loader)
                 if self._validator is not None:
                     self._validator.validate(config_data)
                 self._config_data = SearchableDict(config_data)
@@ -229,5 +731,5 @@ class YAMLConfigurationFile(ConfigurationFile):
                 raise e
 
     def write(self):
-        with open(self.path, 'w') as f:
-            f.write(yaml.dump(dict(self._config_data), Dumper=YAMLConfigurationFile.NoAliasDumper))
+        with self._open_for_write() as f:
+            yaml.dump(dict(self._config_data), f, Dumper=self._dumper)
@@ -0,0 +1,251 @@
+"""
+Lazy access to large JSON documents held in a buffer, usually a memory mapped file. Objects are indexed the first time
+they are searched, recording where each value starts and ends without decoding it, and values are only decoded when
+they are read. Skipping over values is done with regular expressions that consume whole strings and flat arrays or
+objects at once, so only nested containers are walked in Python.
+"""
+import json
+import re
+import threading
+from collections.abc import Mapping
+
+from clilib.util.dict import compile_path
+
+_WHITESPACE_RE = re.compile(rb'[ \t\n\r]*')
+_STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+_STRING_RE = re.compile(_STRING)
+_SCALAR_RE = re.compile(rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null|NaN|-?Infinity')
+
+
+def _flat(group: int):
+    # Strings and other bytes up to a bracket. Runs of other bytes are matched atomically through a lookahead and a
+    # backreference, so a container that turns out not to be flat fails without exponential backtracking.
+    return rb'(?:(?=([^"\[\]{}]+))\%d|' % group + _STRING + rb')*'
+
+
+# Everything up to the next bracket that opens or closes a nested container
+_RUN_RE = re.compile(rb'(?:[^"\[\]{}]+|' + _STRING + rb'|\[' + _flat(1) + rb'\]|\{' + _flat(2) + rb'\})*')
+
+# Spans of this many bytes or more are compared in chunks, so comparing large values does not copy them whole
+_COMPARE_CHUNK = 1 << 20
+
+_QUOTE = ord('"')
+_COMMA = ord(",")
+_COLON = ord(":")
+_OPEN_OBJECT = ord("{")
+_CLOSE_OBJECT = ord("}")
+_OPEN_ARRAY = ord("[")
+_CLOSE_ARRAY = ord("]")
+
+
+def _invalid(message: str, pos: int):
+    return ValueError("Invalid JSON: %s at offset %d" % (message, pos))
+
+
+def _skip_container(buffer, pos: int):
+    depth = 0
+    match = _RUN_RE.match
+    end = len(buffer)
+    while pos < end:
+        c = buffer[pos]
+        if c == _OPEN_OBJECT or c == _OPEN_ARRAY:
+            depth += 1
+        elif c == _CLOSE_OBJECT or c == _CLOSE_ARRAY:
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        else:
+            raise _invalid("unterminated string", pos)
+        pos = match(buffer, pos + 1).end()
+    raise _invalid("unterminated container", pos)
+
+
+def _same_text(buffer, start: int, end: int, other, other_start: int, other_end: int):
+    if end - start != other_end - other_start:
+        return False
+    offset = 0
+    while start + offset < end:
+        size = min(_COMPARE_CHUNK, end - start - offset)
+        if buffer[start + offset:start + offset + size] != other[other_start + offset:other_start + offset + size]:
+            return False
+        offset += size
+    return True
+
+
+def skip_value(buffer, pos: int):
+    """
+    Find the end of the JSON value starting at given offset, without decoding it
+    :param buffer: bytes-like object, such as an mmap
+    :param pos: Offset of the first byte of the value
+    :return: Offset just past the value
+    """
+    if pos >= len(buffer):
+        raise _invalid("expected value", pos)
+    c = buffer[pos]
+    if c == _OPEN_OBJECT or c == _OPEN_ARRAY:
+        return _skip_container(buffer, pos)
+    if c == _QUOTE:
+        match = _STRING_RE.match(buffer, pos)
+    else:
+        match = _SCALAR_RE.match(buffer, pos)
+    if match is None:
+        raise _invalid("expected value", pos)
+    return match.end()
+
+
+class LazyJSONObject(Mapping):
+    """
+    Read-only mapping over a JSON object in a buffer. All keys of the object are indexed the first time one is looked up,
+    so that a key appearing more than once maps to its last value, as with json.load. Values are decoded the first time
+    they are read. Values that are objects are returned as LazyJSONObject
+    instances, so reading a.b only decodes b. Everything else is decoded with the json module.
+    """
+    def __init__(self, buffer, start: int, end: int = None):
+        """
+        :param buffer: bytes-like object, such as an mmap, that must not change while this object is used
+        :param start: Offset of the opening brace
+        :param end: Offset just past the closing brace, if known
+        """
+        self._buffer = buffer
+        self._start = start
+        self._end = end
+        self._spans = {}
+        self._values = {}
+        self._complete = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """
+        Get lazy object for a buffer holding a JSON document whose top level value is an object
+        :param buffer: bytes-like object, such as an mmap
+        :return: LazyJSONObject
+        """
+        start = _WHITESPACE_RE.match(buffer, 0).end()
+        if start >= len(buffer) or buffer[start] != _OPEN_OBJECT:
+            raise _invalid("expected top level object", start)
+        return cls(buffer, start)
+
+    def _scan(self):
+        # Index every key of the object. Later duplicates replace earlier spans, so the last value of a key wins.
+        buffer = self._buffer
+        whitespace = _WHITESPACE_RE.match
+        with self._lock:
+            if self._complete:
+                # Indexed by another thread while waiting for the lock
+                return
+            spans = {}
+            pos = self._start + 1
+            try:
+                while True:
+                    pos = whitespace(buffer, pos).end()
+                    c = buffer[pos]
+                    if c == _CLOSE_OBJECT:
+                        break
+                    if c == _COMMA and len(spans) > 0:
+                        pos = whitespace(buffer, pos + 1).end()
+                    match = _STRING_RE.match(buffer, pos)
+                    if match is None:
+                        raise _invalid("expected key", pos)
+                    raw = match.group()
+                    name = json.loads(raw) if b"\\" in raw else raw[1:-1].decode("utf-8")
+                    pos = whitespace(buffer, match.end()).end()
+                    if buffer[pos] != _COLON:
+                        raise _invalid("expected ':'", pos)
+                    pos = whitespace(buffer, pos + 1).end()
+                    end = skip_value(buffer, pos)
+                    spans[name] = (pos, end)
+                    pos = end
+            except IndexError:
+                raise _invalid("unexpected end of document", pos)
+            self._spans = spans
+            self._end = pos + 1
+            self._complete = True
+
+    def _span(self, key: str):
+        if not self._complete:
+            self._scan()
+        return self._spans.get(key, None)
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        span = self._span(key)
+        if span is None:
+            raise KeyError(key)
+        start, end = span
+        if self._buffer[start] == _OPEN_OBJECT:
+            value = LazyJSONObject(self._buffer, start, end)
+        else:
+            value = json.loads(self._buffer[start:end])
+        self._values[key] = value
+        return value
+
+    def __contains__(self, key):
+        return self._span(key) is not None
+
+    def __iter__(self):
+        if not self._complete:
+            self._scan()
+        return iter(self._spans)
+
+    def __len__(self):
+        if not self._complete:
+            self._scan()
+        return len(self._spans)
+
+    def __repr__(self):
+        return "LazyJSONObject(%d keys indexed%s)" % (len(self._spans), "" if self._complete else ", not indexed")
+
+    def decode(self):
+        """
+        Decode the whole object. Every call decodes it again, so callers are free to modify the returned dict.
+        :return: dict
+        """
+        if self._end is None:
+            self._scan()
+        return json.loads(self._buffer[self._start:self._end])
+
+    def diff(self, other: "LazyJSONObject", prefix: str = None):
+        """
+        List the dot separated paths whose values differ from another lazy object, like clilib.util.dict.diff_paths.
+        Values whose JSON text is identical in both documents are skipped without being decoded, so only changed values
+        are decoded, and changed objects are compared key by key.
+        :param other: Current object, compared against this one
+        :param prefix: Path of the compared objects, used to prefix the returned paths
+        :return: list of paths that were added, removed or changed
+        """
+        if not self._complete:
+            self._scan()
+        changed = []
+        for key in other:
+            path = key if prefix is None else "%s.%s" % (prefix, key)
+            span = self._spans.get(key, None)
+            if span is None:
+                changed.append(path)
+                continue
+            start, end = span
+            other_start, other_end = other._spans[key]
+            if _same_text(self._buffer, start, end, other._buffer, other_start, other_end):
+                continue
+            previous = self[key]
+            value = other[key]
+            if isinstance(previous, LazyJSONObject) and isinstance(value, LazyJSONObject):
+                changed.extend(previous.diff(value, path))
+            elif previous != value:
+                changed.append(path)
+        for key in self._spans:
+            if key not in other._spans:
+                changed.append(key if prefix is None else "%s.%s" % (prefix, key))
+        return changed
+
+    def get_path(self, path: str, default=None):
+        """
+        Return value based on dot separated path, decoding only what the path goes through
+        :param path: Path to retrieve
+        :param default: Default value to return if path does not exist
+        :return: Value at path. Objects are returned as LazyJSONObject.
+        """
+        return compile_path(path).get(self, default)
@@ -0,0 +1,218 @@
+"""
+Watch configuration files for changes on disk. A single background thread can watch any number of configuration
+files. On Linux the thread sleeps on inotify events for the directories of watched files, elsewhere (or when inotify
+is unavailable) it polls file metadata at a fixed interval. Either way, a file is only parsed again when its stat
+signature (modification time, size and inode) changed.
+"""
+import os
+import select
+import struct
+import sys
+import threading
+import weakref
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """
+    Minimal inotify binding through ctypes
+    """
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    # Files are checked once a writer closes them or renames them into place, not while they are being written
+    WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._ctypes = ctypes
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise self._error("inotify_init1")
+
+    def _error(self, call: str):
+        errno = self._ctypes.get_errno()
+        return OSError(errno, "%s: %s" % (call, os.strerror(errno)))
+
+    def add_watch(self, directory: str):
+        """
+        Watch directory for changes to its entries
+        :param directory: Directory to watch
+        :return: watch descriptor
+        """
+        wd = self._add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd < 0:
+            raise self._error("inotify_add_watch")
+        return wd
+
+    def read(self, timeout: float):
+        """
+        Wait for events
+        :param timeout: Maximum time to wait in seconds
+        :return: list of (watch descriptor, file name) tuples
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """
+    Background thread calling check_reload on configuration files when they change on disk. Configuration files are
+    held weakly, so watching a configuration file does not keep it alive. Change callbacks run on the watcher thread.
+    """
+    def __init__(self, interval: float = 1.0, use_inotify: bool = True):
+        """
+        :param interval: Seconds between polls of files that are not watched through inotify
+        :param use_inotify: Use inotify when available. Falls back to polling if inotify cannot be used.
+        """
+        self.interval = interval
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self._configs = weakref.WeakKeyDictionary()
+        self._polled = weakref.WeakSet()
+        self._directories = {}
+        self._watch_dirs = {}
+        self._inotify = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._logger = None
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            from clilib.util.logging import Logging
+            self._logger = Logging("ConfigWatcher").get_logger()
+        return self._logger
+
+    @property
+    def inotify_active(self):
+        """
+        Whether changes are detected through inotify rather than polling
+        :return: Bool
+        """
+        return self._inotify is not None
+
+    def add(self, config):
+        """
+        Start watching configuration file
+        :param config: ConfigurationFile instance
+        :return: void
+        """
+        with self._lock:
+            directory = str(config.path.parent.resolve())
+            self._configs[config] = (directory, config.path.name)
+            if self.use_inotify and self._inotify is None:
+                try:
+                    self._inotify = _Inotify()
+                except (OSError, AttributeError) as e:
+                    self.logger.debug("inotify unavailable, polling for changes instead: %s" % e)
+                    self.use_inotify = False
+            if self._inotify is not None:
+                try:
+                    if directory not in self._directories:
+                        wd = self._inotify.add_watch(directory)
+                        self._directories[directory] = wd
+                        self._watch_dirs[wd] = directory
+                except OSError as e:
+                    self.logger.debug("Cannot watch %s through inotify, polling instead: %s" % (directory, e))
+                    self._polled.add(config)
+            else:
+                self._polled.add(config)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="clilib-config-watcher", daemon=True)
+                self._thread.start()
+
+    def remove(self, config):
+        """
+        Stop watching configuration file
+        :param config: ConfigurationFile instance
+        :return: void
+        """
+        with self._lock:
+            self._configs.pop(config, None)
+            self._polled.discard(config)
+
+    def stop(self):
+        """
+        Stop watcher thread and release inotify resources
+        :return: void
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        with self._lock:
+            self._thread = None
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+                self._directories = {}
+                self._watch_dirs = {}
+
+    def _check(self, configs):
+        for config in configs:
+            try:
+                config.check_reload()
+            except Exception as e:
+                self.logger.warning("Unable to reload configuration file %s: %s" % (config.path, e))
+
+    def _run(self):
+        while not self._stop.is_set():
+            inotify = self._inotify
+            if inotify is None:
+                self._stop.wait(self.interval)
+                with self._lock:
+                    configs = list(self._configs)
+            else:
+                events = set()
+                for wd, name in inotify.read(self.interval):
+                    events.add((self._watch_dirs.get(wd, None), name))
+                with self._lock:
+                    configs = list(self._polled)
+                    for config, location in self._configs.items():
+                        if location in events:
+                            configs.append(config)
+            if not self._stop.is_set():
+                self._check(configs)
+
+
+_default_watcher = None
+_default_watcher_lock = threading.Lock()
+
+
+def default_watcher():
+    """
+    Get the watcher shared by every configuration file watched without an explicit watcher
+    :return: ConfigWatcher
+    """
+    global _default_watcher
+    with _default_watcher_lock:
+        if _default_watcher is None:
+            _default_watcher = ConfigWatcher()
+        return _default_watcher
@@ -1,11 +1,33 @@
 import argparse
+import sys
 
+from clilib.builders.spec import freeze_spec
 from clilib.util.decorators import deprecated
+from clilib.util.profiling import StartupProfile
+
+_NO_PROFILE = StartupProfile("arg_tools", enabled=False)
+# Actions that never consume a value from the command line.
+_VALUELESS_ACTIONS = ("store_true", "store_false", "store_const", "append_const", "count", "help", "version")
+
+
+class _LazyParseError(Exception):
+    pass
+
+
+class _LazyArgumentParser(argparse.ArgumentParser):
+    """
+    Parser used for lazily built command-lines. Errors are raised instead of printed so that the full parser can be
+    built to produce the exact same error output.
+    """
+    def error(self, message):
+        raise _LazyParseError(message)
 
 
 class arg_tools:
     """
-    Tools for setting up argparse automatically based on a dict specification
+    Tools for setting up argparse automatically based on a dict specification. Specifications are never modified; dict
+    specifications are converted to CommandSpec on every call, so callers that build parsers repeatedly should pass a
+    CommandSpec (see SpecBuilder.freeze) instead.
     """
     parser = None
     subparsers = {}
@@ -24,16 +46,22 @@ class arg_tools:
             exit(1)
 
     @staticmethod
-    def build_simple_parser(spec):
+    def build_simple_parser(spec, profile: StartupProfile = None):
         """
         Build simple, one-dimensional parser based on given specification and parse arguments
         :param spec: Parser specification
+        :param profile: Optional StartupProfile to record parser construction and parsing in
         :return: Namespace
         """
-        parser = argparse.ArgumentParser(description=spec.get("desc", None))
-        arg_tools.build_subparser_args(spec, parser)
+        if profile is None:
+            profile = _NO_PROFILE
+        spec = freeze_spec(spec)
+        with profile.phase("argparse construction"):
+            parser = argparse.ArgumentParser(description=spec.desc)
+            arg_tools.build_subparser_args(spec, parser)
         arg_tools.parser = parser
-        return parser.parse_args()
+        with profile.phase("parse"):
+            return parser.parse_args()
 
     @staticmethod
     def build_full_parser(spec):
@@ -42,12 +70,12 @@ class arg_tools:
         :param spec: Parser specification
         :return:
         """
+        spec = freeze_spec(spec)
         parser = argparse.ArgumentParser()
-        subparser = parser.add_subparsers(dest='cmd', description=spec['desc'])
-        aliases = spec.get("aliases", [])
-        parser_baz = subparser.add_parser(spec['name'], help=spec['desc'], description=spec['desc'], aliases=aliases)
+        subparser = parser.add_subparsers(dest='cmd', description=spec.desc)
+        parser_baz = subparser.add_parser(spec.name, help=spec.desc, description=spec.desc, aliases=spec.aliases)
         arg_tools.parser = parser
-        arg_tools.subparsers[spec["name"]] = parser_baz
+        arg_tools.subparsers[spec.name] = parser_baz
         return parser, parser_baz
 
     @staticmethod
@@ -58,6 +86,7 @@ class arg_tools:
         :param spec: Parser specification
         :return: Namespace
         """
+        spec = freeze_spec(spec)
         parser, subparser = arg_tools.build_full_parser(spec)
         arg_tools.build_subparser_args(spec, subparser)
 
@@ -65,29 +94,131 @@ class arg_tools:
 
     @staticmethod
     def build_nested_subparsers(spec):
+        spec = freeze_spec(spec)
         parser = argparse.ArgumentParser(add_help=False)
-        cmd_subparsers = parser.add_subparsers(dest='cmd', description=spec['desc'])
-        cmd_parser = cmd_subparsers.add_parser(spec['name'], help=spec['desc'], description=spec['desc'])
-        subcommand_subparser = cmd_parser.add_subparsers(dest='subcmd', description=spec['desc'])
+        cmd_subparsers = parser.add_subparsers(dest='cmd', description=spec.desc)
+        cmd_parser = cmd_subparsers.add_parser(spec.name, help=spec.desc, description=spec.desc)
+        subcommand_subparser = cmd_parser.add_subparsers(dest='subcmd', description=spec.desc)
         arg_tools.build_subparser_args(spec, cmd_parser)
         arg_tools.process_subcommands(spec, subcommand_subparser)
 
         return parser.parse_args()
 
     @staticmethod
-    def build_full_cli(spec):
+    def build_full_cli(spec, lazy: bool = False, argv: list = None, profile: StartupProfile = None):
         """
         Build full command-line application based on specification.
         :param spec: Parser specification
+        :param lazy: Only build parsers for the subcommands selected by the given arguments. The full parser is still
+        built when help is requested, when no subcommand is selected or when the arguments are invalid, so output is the
+        same as without lazy. Note that arg_tools.parser will only contain the selected subcommands after a lazy parse.
+        :param argv: Arguments to parse. Default is sys.argv
+        :param profile: Optional StartupProfile to record parser construction and parsing in
         :return: Namespace
         """
-        arg_tools.parser = parser = argparse.ArgumentParser(description=spec.get("desc", ""))
+        if profile is None:
+            profile = _NO_PROFILE
+        spec = freeze_spec(spec)
+        if argv is None:
+            argv = sys.argv[1:]
+        if lazy:
+            with profile.phase("parse"):
+                path = arg_tools.scan_subcommand_path(spec, argv)
+            if path is not None:
+                with profile.phase("argparse construction"):
+                    parser = _LazyArgumentParser(description=spec.desc)
+                    arg_tools.build_subparser_args(spec, parser)
+                    cmd_subparsers = parser.add_subparsers(dest="subcommand", description="Available Subcommands")
+                    arg_tools.add_subcommand_parser(spec, path[0], cmd_subparsers, path[1:])
+                try:
+                    with profile.phase("parse"):
+                        args = parser.parse_args(argv)
+                    arg_tools.parser = parser
+                    return args
+                except _LazyParseError:
+                    pass
+        with profile.phase("argparse construction"):
+            arg_tools.parser = parser = arg_tools.build_cli_parser(spec)
+        with profile.phase("parse"):
+            return parser.parse_args(argv)
+
+    @staticmethod
+    def build_cli_parser(spec):
+        """
+        Build full command-line parser based on specification without parsing any arguments. Unlike build_full_cli, this
+        does not set arg_tools.parser, so the returned parser can be kept and reused independently.
+        :param spec: Parser specification
+        :return: ArgumentParser
+        """
+        spec = freeze_spec(spec)
+        parser = argparse.ArgumentParser(description=spec.desc)
         arg_tools.build_subparser_args(spec, parser)
-        subcommands = spec.get("subcommands", [])
-        if len(subcommands) > 0:
+        if len(spec.subcommands) > 0:
             cmd_subparsers = parser.add_subparsers(dest="subcommand", description="Available Subcommands")
             arg_tools.process_subcommands(spec, cmd_subparsers)
-        return parser.parse_args()
+        return parser
+
+    @staticmethod
+    def scan_subcommand_path(spec, argv: list):
+        """
+        Find the subcommands selected by given arguments without building any parsers.
+        :param spec: Parser specification
+        :param argv: Arguments to scan
+        :return: List of subcommand specifications from the top level down to the selected leaf subcommand, or None if
+        help is requested, no leaf subcommand is selected or the selection cannot be determined without argparse.
+        """
+        path = []
+        current = freeze_spec(spec)
+        pos = 0
+        while len(current.subcommands) > 0:
+            flags = {}
+            for flag in current.flags:
+                for name in flag.names:
+                    flags[name] = flag.kwargs
+            positionals = len(current.positionals)
+            if any("nargs" in p.kwargs for p in current.positionals):
+                return None
+            selected = None
+            while selected is None:
+                if pos >= len(argv):
+                    return None
+                token = argv[pos]
+                pos += 1
+                if token in ("-h", "--help", "--"):
+                    return None
+                if token.startswith("-") and token != "-":
+                    name, _, value = token.partition("=")
+                    flag = flags.get(name, None)
+                    if flag is None:
+                        return None
+                    if value or flag.get("action", "store") in _VALUELESS_ACTIONS:
+                        continue
+                    nargs = flag.get("nargs", None)
+                    if nargs is None:
+                        pos += 1
+                    elif isinstance(nargs, int):
+                        pos += nargs
+                    else:
+                        if nargs == "?":
+                            limit = pos + 1
+                        else:
+                            limit = len(argv)
+                        while pos < limit and not argv[pos].startswith("-"):
+                            pos += 1
+                elif positionals > 0:
+                    positionals -= 1
+                else:
+                    for sub in current.subcommands:
+                        if token == sub.name or token in sub.aliases:
+                            selected = sub
+                            break
+                    else:
+                        return None
+            path.append(selected)
+            current = selected
+        if len(path) == 0:
+            return None
+        return path
 
     @staticmethod
     def build_subparser_args(spec, subparser):
@@ -97,15 +228,12 @@ class arg_tools:
         :param subparser: Subparser to add arguments to
         :return: None
         """
-        for pos in spec['positionals']:
-            name = pos["name"]
-            del pos["name"]
-            subparser.add_argument(name, **pos)
+        spec = freeze_spec(spec)
+        for pos in spec.positionals:
+            subparser.add_argument(pos.name, **pos.kwargs)
 
-        for flag in spec['flags']:
-            names = flag["names"]
-            del flag["names"]
-            subparser.add_argument(*names, **flag)
+        for flag in spec.flags:
+            subparser.add_argument(*flag.names, **flag.kwargs)
 
     @staticmethod
     def process_subcommands(spec, subcommand_subparser):
@@ -115,14 +243,31 @@ class arg_tools:
         :param subcommand_subparser: Subparser to manipulate
         :return:
         """
-        for subcommand in spec['subcommands']:
-            subcommand_name = subcommand['name']
-            aliases = subcommand.get("aliases", [])
-            subcommand_parser = subcommand_subparser.add_parser(subcommand_name, help=subcommand['desc'],
-                                                                description=subcommand['desc'],
-                                                                aliases=aliases)
-            arg_tools.build_subparser_args(subcommand, subcommand_parser)
-            sbc = subcommand.get("subcommands", [])
-            if len(sbc) > 0:
-                subcommand_sp = subcommand_parser.add_subparsers(dest=subcommand['name'], description=spec['desc'])
+        spec = freeze_spec(spec)
+        for subcommand in spec.subcommands:
+            arg_tools.add_subcommand_parser(spec, subcommand, subcommand_subparser)
+
+    @staticmethod
+    def add_subcommand_parser(spec, subcommand, subcommand_subparser, path: list = None):
+        """
+        Add a single subcommand from given specification to given subparser
+        :param spec: Specification of the parent command
+        :param subcommand: Specification of the subcommand to add
+        :param subcommand_subparser: Subparser to manipulate
+        :param path: Only add the subcommands in this list (as returned by scan_subcommand_path) below the subcommand
+        instead of all of them.
+        :return: Parser for the added subcommand
+        """
+        spec = freeze_spec(spec)
+        subcommand = freeze_spec(subcommand)
+        subcommand_parser = subcommand_subparser.add_parser(subcommand.name, help=subcommand.desc,
+                                                            description=subcommand.desc,
+                                                            aliases=subcommand.aliases)
+        arg_tools.build_subparser_args(subcommand, subcommand_parser)
+        if len(subcommand.subcommands) > 0:
+            subcommand_sp = subcommand_parser.add_subparsers(dest=subcommand.name, description=spec.desc)
+            if path is None:
                 arg_tools.process_subcommands(subcommand, subcommand_sp)
+            else:
+                arg_tools.add_subcommand_parser(subcommand, path[0], subcommand_sp, path[1:])
+        return subcommand_parser
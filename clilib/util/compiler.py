@@ -0,0 +1,55 @@
+import importlib
+import sys
+from functools import reduce
+from clilib.util.logging import Logging
+from clilib.builders.app import EasyCLI, compile_cli, compiled_is_stale
+
+
+class CompileUtils:
+    """
+    Generate and check ahead-of-time compiled entry modules for EasyCLI applications
+    """
+    def __init__(self, debug: bool = False):
+        """
+        :param debug: Add additional debugging output
+        """
+        self.logger = Logging("CompileUtils", debug=debug).get_logger()
+        if "" not in sys.path:
+            sys.path.insert(0, "")
+
+    @staticmethod
+    def _resolve(target: str):
+        module_name, _, qualname = target.partition(":")
+        if not qualname:
+            raise ValueError("Target must be given in the form module:object, not %s" % target)
+        module = importlib.import_module(module_name)
+        return reduce(getattr, qualname.split("."), module)
+
+    def build(self, target: str, output: str, print_return: bool = False):
+        """
+        Generate compiled entry module for an EasyCLI application
+        :param target: Object to compile in the form module:object
+        :param output: Path of the module to generate
+        :param print_return: Print return value of the executed method
+        """
+        self.logger.info("Compiling [%s] to [%s] ..." % (target, output))
+        compile_cli(self._resolve(target), output, print_return=print_return)
+
+    def check(self, output: str, target: str = None):
+        """
+        Check whether a compiled entry module is stale, exiting with status 1 if it is.
+        :param output: Path of the generated module
+        :param target: Object the module was compiled from in the form module:object. If given, the generated module is
+        also compared against a freshly compiled one.
+        """
+        obj = None
+        if target is not None:
+            obj = self._resolve(target)
+        if compiled_is_stale(output, obj):
+            self.logger.warning("Compiled module [%s] is stale." % output)
+            sys.exit(1)
+        self.logger.info("Compiled module [%s] is up to date." % output)
+
+
+def cli():
+    EasyCLI(CompileUtils)
@@ -1,8 +1,352 @@
 import re
+from collections.abc import Mapping
+from functools import lru_cache
 
 # Use jsonpath-like path on dictionary to get result
 from typing import Any
 
+_SEGMENT_RE = re.compile(r'^([^\[\]]*)((?:\[[^\[\]]*\])+)$')
+_SELECTOR_RE = re.compile(r'\[([^\[\]]*)\]')
+_INDEX_RE = re.compile(r'^-?\d+$')
+_SLICE_RE = re.compile(r'^(-?\d*):(-?\d*)(?::(-?\d*))?$')
+
+# Kinds of compiled path steps
+_KEY = 0
+_INDEX = 1
+_SLICE = 2
+_ALL = 3
+# Key whose value must be a list, as it is followed by list selectors in the same segment
+_LIST_KEY = 4
+
+
+def _compile_segment(segment: str):
+    match = _SEGMENT_RE.match(segment)
+    if match is None:
+        return [(_KEY, segment, segment)]
+    name, selectors = match.groups()
+    steps = []
+    if name:
+        steps.append((_LIST_KEY, name, segment))
+    for selector in _SELECTOR_RE.findall(selectors):
+        selector = selector.strip()
+        if selector == "*":
+            steps.append((_ALL, None, segment))
+        elif _INDEX_RE.match(selector):
+            steps.append((_INDEX, int(selector), segment))
+        else:
+            bounds = _SLICE_RE.match(selector)
+            if bounds is None:
+                # Not a selector, so the brackets are part of the key.
+                return [(_KEY, segment, segment)]
+            steps.append((_SLICE, tuple(int(b) if b else None for b in bounds.groups()), segment))
+    return steps
+
+
+def _select(d, kind: int, arg, segment: str):
+    if kind == _LIST_KEY:
+        return d.get(arg, None)
+    if kind == _KEY:
+        d = d.get(arg, None)
+    elif not isinstance(d, list):
+        raise TypeError("Value for key %s is not a list" % segment.split("[")[0])
+    else:
+        d = d[arg]
+    if d is None:
+        raise IndexError(segment)
+    return d
+
+
+def _fan_out(d, kind: int, arg, segment: str):
+    if not isinstance(d, list):
+        raise TypeError("Value for key %s is not a list" % segment.split("[")[0])
+    if kind == _SLICE:
+        return d[slice(*arg)]
+    return d
+
+
+class CompiledPath:
+    """
+    Dot separated path compiled into a tuple of steps, so it can be used any number of times without being parsed
+    again. Use compile_path to get instances.
+
+    Each segment is a key, optionally followed by any number of list selectors: an index ([0], [-1]), a slice ([1:5],
+    [::2]) or a wildcard ([*]). Paths with slices or wildcards select every matching element, and the rest of the path
+    is applied to each of them, e.g. servers[*].name returns a list with the name of every server that has one.
+    """
+    __slots__ = ("path", "steps", "set_steps")
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to compile
+        """
+        self.path = path
+        steps = []
+        for segment in path.split("."):
+            if not segment:
+                continue
+            steps.extend(_compile_segment(segment))
+        self.steps = tuple(steps)
+        # Empty segments are skipped, except for the last one when setting, which is an empty key like any other.
+        if path.endswith(".") or not path:
+            self.set_steps = self.steps + ((_KEY, "", ""),)
+        else:
+            self.set_steps = self.steps
+
+    def __repr__(self):
+        return "CompiledPath(%s)" % repr(self.path)
+
+    def _walk(self, d, start: int):
+        pos = start
+        for kind, arg, segment in self.steps[start:] if start else self.steps:
+            pos += 1
+            if kind == _KEY:
+                d = d.get(arg, None)
+            elif kind == _LIST_KEY:
+                # A missing list is reported by the selector that follows
+                d = d.get(arg, None)
+                continue
+            elif kind == _INDEX:
+                if not isinstance(d, list):
+                    raise TypeError("Value for key %s is not a list" % segment.split("[")[0])
+                try:
+                    d = d[arg]
+                except IndexError:
+                    d = None
+            else:
+                results = []
+                for item in _fan_out(d, kind, arg, segment):
+                    try:
+                        results.append(self._walk(item, pos))
+                    except IndexError:
+                        continue
+                return results
+            if d is None:
+                raise IndexError("Given dictionary does not contain path: %s (key: %s)" % (self.path, segment))
+        return d
+
+    def search(self, d: dict):
+        """
+        Traverses given dictionary and returns result based on this path
+        :param d: Dictionary to traverse
+        :return: Value at path. Raises IndexError if the dictionary does not contain the path
+        """
+        return self._walk(d, 0)
+
+    def get(self, d: dict, default: Any = None):
+        """
+        Return value from dictionary based on this path
+        :param d: Dictionary to traverse
+        :param default: Default value to return if path does not exist
+        :return:
+        """
+        try:
+            return self._walk(d, 0)
+        except IndexError:
+            return default
+
+    def exists(self, d: dict):
+        """
+        Check whether dictionary contains this path
+        :param d: Dictionary to traverse
+        :return: Bool
+        """
+        try:
+            self._walk(d, 0)
+        except (IndexError, TypeError, AttributeError):
+            return False
+        return True
+
+    def _set(self, d, start: int, value: Any):
+        steps = self.set_steps
+        last = len(steps) - 1
+        for pos in range(start, last):
+            kind, arg, segment = steps[pos]
+            if kind == _SLICE or kind == _ALL:
+                for item in _fan_out(d, kind, arg, segment):
+                    self._set(item, pos + 1, value)
+                return
+            if kind == _KEY:
+                if d.get(arg, None) is None:
+                    d[arg] = SearchableDict()
+                d = d.get(arg)
+            else:
+                d = _select(d, kind, arg, segment)
+        kind, arg, segment = steps[last]
+        if kind == _KEY:
+            d[arg] = value
+            return
+        if not isinstance(d, list):
+            raise TypeError("Value for key %s is not a list" % segment.split("[")[0])
+        if kind == _INDEX:
+            d[arg] = value
+        else:
+            for i in range(len(d))[slice(*arg) if kind == _SLICE else slice(None)]:
+                d[i] = value
+
+    def set(self, d: dict, value: Any):
+        """
+        Set value of this path in given dictionary, creating missing dictionaries along the way. If the path ends in a
+        list selector, the value is assigned into the existing list. With slices or wildcards, the value is set for
+        every matching element.
+        :param d: Dictionary to modify
+        :param value: Value to set
+        :return:
+        """
+        self._set(d, 0, value)
+
+    def _assoc(self, d, start: int, value: Any):
+        kind, arg, segment = self.set_steps[start]
+        last = start == len(self.set_steps) - 1
+        if kind == _KEY or kind == _LIST_KEY:
+            if d is None:
+                new = SearchableDict()
+            else:
+                new = type(d)(d)
+            new[arg] = value if last else self._assoc(new.get(arg, None), start + 1, value)
+            return new
+        if not isinstance(d, list):
+            raise TypeError("Value for key %s is not a list" % segment.split("[")[0])
+        new = list(d)
+        if kind == _INDEX:
+            new[arg] = value if last else self._assoc(_select(d, kind, arg, segment), start + 1, value)
+        else:
+            for i in range(len(d))[slice(*arg) if kind == _SLICE else slice(None)]:
+                new[i] = value if last else self._assoc(d[i], start + 1, value)
+        return new
+
+    def assoc(self, d: dict, value: Any):
+        """
+        Copy-on-write version of set. Only the dictionaries and lists along this path are copied, everything else is
+        shared with the given dictionary, which is left unchanged.
+        :param d: Dictionary to set value in
+        :param value: Value to set
+        :return: New dictionary of the same type as d
+        """
+        return self._assoc(d, 0, value)
+
+    def changed_keys(self, d: dict):
+        """
+        Get the keys under which setting this path changes the given dictionary: the leading dictionary keys of this
+        path, up to and including the first one missing from d. Everything outside the value at these keys is left
+        as it is.
+        :param d: Dictionary the path would be set in
+        :return: list of keys
+        """
+        keys = []
+        for kind, arg, _ in self.set_steps:
+            if kind != _KEY and kind != _LIST_KEY:
+                break
+            keys.append(arg)
+            d = d.get(arg, None) if isinstance(d, dict) else None
+            if d is None:
+                break
+        return keys
+
+
+@lru_cache(maxsize=4096)
+def compile_path(path: str):
+    """
+    Compile dot separated path into a reusable accessor. Compiled paths are kept in a bounded LRU cache, so repeated
+    lookups of the same path are never parsed twice.
+    :param path: Path to compile, e.g. db.replicas[2].host
+    :return: CompiledPath
+    """
+    return CompiledPath(path)
+
+
+class _PathNode:
+    __slots__ = ("kind", "arg", "segment", "children", "values", "fan_outs")
+
+    def __init__(self, kind: int = None, arg: Any = None, segment: str = None):
+        self.kind = kind
+        self.arg = arg
+        self.segment = segment
+        self.children = {}
+        self.values = []
+        self.fan_outs = []
+
+
+@lru_cache(maxsize=256)
+def _compile_many(paths: tuple):
+    root = _PathNode()
+    for i, path in enumerate(compile_path(path) for path in paths):
+        node = root
+        for pos, (kind, arg, segment) in enumerate(path.steps):
+            if kind == _SLICE or kind == _ALL:
+                node.fan_outs.append((i, path, pos))
+                break
+            child = node.children.get((kind, arg), None)
+            if child is None:
+                child = node.children[(kind, arg)] = _PathNode(kind, arg, segment)
+            node = child
+        else:
+            node.values.append(i)
+    stack = [root]
+    while len(stack) > 0:
+        node = stack.pop()
+        node.children = tuple(node.children.values())
+        stack.extend(node.children)
+    return root
+
+
+def get_many(d: dict, paths, default: Any = None):
+    """
+    Return values of many paths from dictionary in a single traversal. Paths are merged on their common prefixes, so
+    every key shared by several paths is only looked up once. The merged paths are cached, so asking for the same set
+    of paths again skips compiling them.
+    :param d: Dictionary to traverse
+    :param paths: Iterable of paths
+    :param default: Default value for paths that do not exist
+    :return: list of values, in the same order as paths
+    """
+    paths = tuple(paths)
+    results = [default] * len(paths)
+    stack = [(_compile_many(paths), d)]
+    while len(stack) > 0:
+        node, value = stack.pop()
+        for i in node.values:
+            results[i] = value
+        for i, path, pos in node.fan_outs:
+            try:
+                results[i] = path._walk(value, pos)
+            except IndexError:
+                pass
+        for child in node.children:
+            try:
+                stack.append((child, _select(value, child.kind, child.arg, child.segment)))
+            except IndexError:
+                continue
+    return results
+
+
+def diff_paths(old: Mapping, new: Mapping, prefix: str = None):
+    """
+    Compare two dictionaries and list the dot separated paths whose values differ. Nested dictionaries (or other
+    mappings) present in both are compared key by key, any other value is compared as a whole. Values shared by both
+    dictionaries, such as subtrees untouched by a copy-on-write update, are skipped without being compared.
+    :param old: Previous dictionary
+    :param new: Current dictionary
+    :param prefix: Path of the compared dictionaries, used to prefix the returned paths
+    :return: list of paths that were added, removed or changed
+    """
+    changed = []
+    for key, value in new.items():
+        path = key if prefix is None else "%s.%s" % (prefix, key)
+        if key not in old:
+            changed.append(path)
+            continue
+        previous = old[key]
+        if previous is value:
+            continue
+        if isinstance(previous, Mapping) and isinstance(value, Mapping):
+            changed.extend(diff_paths(previous, value, path))
+        elif previous != value:
+            changed.append(path)
+    for key in old:
+        if key not in new:
+            changed.append(key if prefix is None else "%s.%s" % (prefix, key))
+    return changed
+
 
 def dict_path(d: dict, path: str):
     """
@@ -10,21 +354,7 @@ def dict_path(d: dict, path: str):
     :param d: Dictionary to traverse
     :param path: Path used to return result
     """
-    for key in path.split("."):
-        if not key:
-            continue
-        li = re.findall(r'[(\d+)]', key)
-        if len(li) > 0:
-            k = key.split("[")[0]
-            if not isinstance(d.get(k), list):
-                raise TypeError("Value for key %s is not a list" % k)
-            l = d.get(k)
-            d = l[int(li[0])]
-        else:
-            d = d.get(key, None)
-        if d is None:
-            raise IndexError("Given dictionary does not contain path: %s (key: %s)" % (path, key))
-    return d
+    return compile_path(path).search(d)
 
 
 class SearchableDict(dict):
@@ -33,22 +363,7 @@ class SearchableDict(dict):
         Traverses given dictionary and returns result based on given path
         :param path: Path used to return result
         """
-        d = self
-        for key in path.split("."):
-            if not key:
-                continue
-            li = re.findall(r'\[(\d+)\]', key)
-            if len(li) > 0:
-                k = key.split("[")[0]
-                if not isinstance(d.get(k), list):
-                    raise TypeError("Value for key %s is not a list" % k)
-                l = d.get(k)
-                d = l[int(li[0])]
-            else:
-                d = d.get(key, None)
-            if d is None:
-                raise IndexError("Given dictionary does not contain path: %s (key: %s)" % (path, key))
-        return d
+        return compile_path(path).search(self)
 
     def get_path(self, path: str, default: Any = None):
         """
@@ -57,11 +372,16 @@ class SearchableDict(dict):
         :param default: Default value to return if path does not exist
         :return:
         """
-        try:
-            value = self.search_path(path)
-        except IndexError:
-            value = default
-        return value
+        return compile_path(path).get(self, default)
+
+    def get_many(self, paths, default: Any = None):
+        """
+        Return values of many paths in a single traversal, looking up shared path prefixes only once
+        :param paths: Iterable of paths to retrieve
+        :param default: Default value for paths that do not exist
+        :return: list of values, in the same order as paths
+        """
+        return get_many(self, paths, default)
 
     def set_path(self, path: str, value: Any):
         """
@@ -70,24 +390,14 @@ class SearchableDict(dict):
         :param value: Value to set for given path
         :return:
         """
-        d = self
-        path_parts = path.split(".")
-        destination = path_parts.pop()
-        for key in path_parts:
-            if not key:
-                continue
-            li = re.findall(r'\[(\d+)\]', key)
-            if len(li) > 0:
-                k = key.split("[")[0]
-                if not isinstance(d.get(k), list):
-                    raise TypeError("Value for key %s is not a list" % k)
-                l = d.get(k)
-                d = l[int(li[0])]
-            else:
-                n = d.get(key, None)
-                if n is None:
-                    d[key] = SearchableDict()
-                d = d.get(key)
-            if d is None:
-                raise IndexError("Given dictionary does not contain path: %s (key: %s)" % (path, key))
-        d[destination] = value
+        compile_path(path).set(self, value)
+
+    def with_path(self, path: str, value: Any):
+        """
+        Get a copy of this dictionary with value set at given path. Only the dictionaries and lists along the path are
+        copied, the rest is shared with this dictionary, which is left unchanged.
+        :param path: Path to set
+        :param value: Value to set for given path
+        :return: SearchableDict
+        """
+        return compile_path(path).assoc(self, value)
@@ -1,3 +1,7 @@
 
 class SchemaException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class ProfileBudgetExceeded(Exception):
+    pass
@@ -0,0 +1,200 @@
+"""
+Startup profiling for clilib applications. Profiling is switched on with the CLILIB_PROFILE environment variable or the
+profile option of EasyCLI and CLIApp, and records the wall-clock time spent in each startup phase:
+
+* import - from the first import of clilib until the application object is created
+* introspection - inspecting classes, functions and docstrings (or loading a cached specification)
+* spec build - building the specification the parser is created from
+* argparse construction - creating argparse parsers
+* parse - parsing the command line
+* dispatch - resolving the selected command to the callable that runs it. The command itself is not timed, and for
+  CLIApp neither is importing the subcommand module.
+
+Set CLILIB_PROFILE to 1 for a readable breakdown on stderr, or to json for a single JSON line. Budgets in milliseconds
+can be given per phase, or for the total, with CLILIB_PROFILE_BUDGET, e.g. "introspection=50,total=200". A phase that
+goes over budget raises ProfileBudgetExceeded once the application finishes normally. Timings are still reported when
+the application exits or raises, but budgets are not checked then, so the application's own exit code or exception is
+kept.
+"""
+import json
+import os
+import sys
+from time import perf_counter
+
+import clilib
+from clilib.util.errors import ProfileBudgetExceeded
+
+PROFILE_ENV = "CLILIB_PROFILE"
+BUDGET_ENV = "CLILIB_PROFILE_BUDGET"
+PHASES = ("import", "introspection", "spec build", "argparse construction", "parse", "dispatch")
+
+
+class _Phase:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile: "StartupProfile", name: str):
+        self.profile = profile
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profile.record(self.name, perf_counter() - self.start)
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class StartupProfile:
+    """
+    Wall-clock timings of the startup phases of an application. Time spent in a phase accumulates over every time the
+    phase is entered.
+    """
+    def __init__(self, name: str, budgets: dict = None, output: str = "text", enabled: bool = True):
+        """
+        :param name: Name of profiled application
+        :param budgets: Optional dict of phase name (or 'total') to maximum time in milliseconds
+        :param output: Format used by emit, 'text' or 'json'
+        :param enabled: Record timings. A disabled profile records nothing and costs next to nothing to use.
+        """
+        self.name = name
+        self.budgets = dict(budgets or {})
+        self.output = output
+        self.enabled = enabled
+        self.phases = {}
+
+    @classmethod
+    def from_env(cls, name: str, profile=None):
+        """
+        Get profile for an application based on its profile option and the environment
+        :param name: Name of profiled application
+        :param profile: True, False, None or a StartupProfile instance. None defers to the CLILIB_PROFILE environment
+        variable.
+        :return: StartupProfile, disabled if profiling is off
+        """
+        if isinstance(profile, StartupProfile):
+            return profile
+        setting = os.environ.get(PROFILE_ENV, "").strip().lower()
+        if profile is None:
+            profile = setting not in ("", "0", "false", "no", "off")
+        if not profile:
+            return cls(name, enabled=False)
+        output = "json" if setting == "json" else "text"
+        return cls(name, budgets=cls.parse_budgets(os.environ.get(BUDGET_ENV, "")), output=output)
+
+    @staticmethod
+    def parse_budgets(value: str):
+        """
+        Parse budget string in the format used by CLILIB_PROFILE_BUDGET
+        :param value: Comma separated phase=milliseconds pairs
+        :return: dict
+        """
+        budgets = {}
+        for item in value.split(","):
+            if item.strip() == "":
+                continue
+            phase, _, limit = item.partition("=")
+            budgets[phase.strip()] = float(limit)
+        return budgets
+
+    def phase(self, name: str):
+        """
+        Get context manager timing given phase
+        :param name: Name of phase
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name: str, seconds: float):
+        """
+        Add time spent in given phase
+        :param name: Name of phase
+        :param seconds: Time spent in seconds
+        :return: void
+        """
+        if self.enabled:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_import(self):
+        """
+        Record time from the first import of clilib until now as the import phase
+        :return: void
+        """
+        self.record("import", perf_counter() - clilib._IMPORTED_AT)
+
+    def report(self):
+        """
+        Get structured breakdown of recorded timings, in milliseconds
+        :return: dict with 'name', 'phases' and 'total' keys
+        """
+        phases = {name: self.phases[name] * 1000 for name in PHASES if name in self.phases}
+        for name, seconds in self.phases.items():
+            if name not in phases:
+                phases[name] = seconds * 1000
+        return {"name": self.name, "phases": phases, "total": sum(phases.values())}
+
+    def format_report(self):
+        """
+        Get recorded timings as readable text
+        :return: str
+        """
+        report = self.report()
+        lines = ["clilib startup profile for [%s]:" % report["name"]]
+        for name, ms in report["phases"].items():
+            lines.append("  %-22s %9.2fms" % (name, ms))
+        lines.append("  %-22s %9.2fms" % ("total", report["total"]))
+        return "\n".join(lines)
+
+    def over_budget(self):
+        """
+        Get phases that took longer than their budget
+        :return: dict of phase name to (time taken, budget) in milliseconds
+        """
+        report = self.report()
+        times = dict(report["phases"], total=report["total"])
+        return {name: (times.get(name, 0.0), limit) for name, limit in self.budgets.items() if times.get(name, 0.0) > limit}
+
+    def check_budgets(self):
+        """
+        Raise if any phase took longer than its budget
+        :return: void
+        """
+        exceeded = self.over_budget()
+        if len(exceeded) > 0:
+            details = ", ".join("%s took %.2fms (budget %gms)" % (name, took, limit) for name, (took, limit) in exceeded.items())
+            raise ProfileBudgetExceeded("Startup budget exceeded for [%s]: %s" % (self.name, details))
+
+    def emit(self, file=None, check: bool = True):
+        """
+        Write recorded timings to stderr, or given file, in the configured output format and check budgets
+        :param file: Writable text file. Default is sys.stderr
+        :param check: Check budgets after writing timings. Pass False while another exception is propagating, so the
+        budget check does not replace it.
+        :return: void
+        """
+        if not self.enabled:
+            return
+        if file is None:
+            file = sys.stderr
+        if self.output == "json":
+            print(json.dumps(self.report()), file=file)
+        else:
+            print(self.format_report(), file=file)
+        if check:
+            self.check_budgets()
@@ -105,10 +105,42 @@ class SchemaValidator:
                     raise SchemaException("SchemaValidator: missing key %s" % key)
             value = subject.get(key, None)
             if value is not None:
-                if isinstance(value, dict):
-                    self._validate_dict(value, key)
-                elif not isinstance(value, value_type):
-                    raise TypeError("Key '%s' expected to be type '%s' but got type '%s'" % (key, value_type, type(value)))
+                self._validate_value(key, value_type, value, key)
+
+    def validate_path(self, subject: dict, keys):
+        """
+        Validate only the value under the given keys of subject, for a subject that was valid before that value was
+        changed. Values outside the changed one are not checked again, which makes validating a single change in a
+        large subject cheap.
+        :param subject: Subject to analyze against schema
+        :param keys: Sequence of keys leading to the changed value. Validates the whole subject if empty.
+        :return: None
+        """
+        if len(keys) == 0:
+            return self.validate(subject)
+        schema = self.schema
+        path = None
+        for depth, key in enumerate(keys):
+            if not isinstance(schema, dict) or key not in schema:
+                # Keys the schema does not know about are never checked
+                return
+            value_type = schema[key]
+            value = subject.get(key, None)
+            path = key if path is None else "%s.%s" % (path, key)
+            if self.strict and key not in subject:
+                raise SchemaException("SchemaValidator: missing key %s" % key)
+            if depth == len(keys) - 1 or not isinstance(value_type, dict) or not isinstance(value, dict):
+                if value is not None or depth > 0:
+                    self._validate_value(key, value_type, value, path)
+                return
+            schema = value_type
+            subject = value
+
+    def _validate_value(self, key: str, value_type, value, path: str):
+        if isinstance(value, dict):
+            self._validate_dict(value, path)
+        elif not isinstance(value, value_type):
+            raise TypeError("Key '%s' expected to be type '%s' but got type '%s'" % (key, value_type, type(value)))
 
     def _validate_dict(self, subject: dict, path: str = "."):
         schema = dict_path(self.schema, path)
@@ -117,7 +149,4 @@ class SchemaValidator:
             if self.strict:
                 if key not in subject:
                     raise SchemaException("SchemaValidator: missing key %s" % key)
-            if isinstance(value, dict):
-                self._validate_dict(value, "%s.%s" % (path, key))
-            elif not isinstance(value, value_type):
-                raise TypeError("Key '%s' expected to be type '%s' but got type '%s'" % (key, value_type, type(value)))
+            self._validate_value(key, value_type, value, "%s.%s" % (path, key))
@@ -1,10 +1,7 @@
-from asyncio import subprocess
 from clilib.util.logging import Logging
 from clilib.builders.app import EasyCLI
 from pathlib import Path
 import subprocess
-import tarfile
-import distutils.core
 import shutil
 import json
 import sys
@@ -27,6 +24,7 @@ class WheelUtils:
         self.working_directory = Path(working_directory)
         self.logger = Logging("WheelUtils", debug=debug).get_logger()
         setup_path = self.working_directory.joinpath("setup.py")
+        import distutils.core
         self._setup = distutils.core.run_setup(str(setup_path))
 
     def build_archive(self, python_executable: str = None, pip_executable: str = None, archive_type: str = None, compression: str = None):
@@ -56,6 +54,7 @@ class WheelUtils:
             shutil.make_archive(str(archive_path), 'zip', str(output_path))
         elif archive_type == "tar":
             self.logger.info("Creating archive at [%s.tar] ..." % str(archive_path))
+            import tarfile
             with tarfile.open(str(archive_path) + ".tar", "w:%s" % compression) as tar:
                 files = os.listdir(str(output_path))
                 for file in files:
@@ -9,7 +9,7 @@ setuptools.setup(
     version=clilib.__version__,
     scripts=[],
     entry_points={
-        'console_scripts': ["wheel_utils = clilib.util.wheel:cli"]
+        'console_scripts': ["wheel_utils = clilib.util.wheel:cli", "easycli_compile = clilib.util.compiler:cli"]
     },
     author="Gage LeBlanc",
     author_email="gleblanc@symnet.io",